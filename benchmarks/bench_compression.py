@@ -0,0 +1,57 @@
+"""CPU time and size of compressing JSON bodies, chained level 9 encodings vs one negotiated encoding
+
+Usage:
+    python benchmarks/bench_compression.py [rounds]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from webserver.compression_util import (
+    DYNAMIC_LEVEL,
+    compress,
+    compressible,
+    deflate,
+    gzip_compress,
+    negotiate,
+)
+
+
+def legacy(body: bytes) -> bytes:
+    """The former `_compress_body` with both encodings accepted, applied one after another"""
+
+    return gzip_compress(deflate(body))
+
+
+def current(body: bytes) -> bytes:
+    if not compressible("application/json", len(body)):
+        return body
+
+    encoding = negotiate("gzip, deflate")
+    return compress(encoding, body, DYNAMIC_LEVEL) if encoding else body
+
+
+def main() -> None:
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    for entries in [2, 40, 1000]:
+        body = json.dumps(
+            {f"sensor_{i}": {"value": i * 0.37, "unit": "C"} for i in range(entries)}
+        ).encode()
+
+        for name, func in [("legacy", legacy), ("current", current)]:
+            start = time.perf_counter()
+            for _ in range(rounds):
+                out = func(body)
+            took = time.perf_counter() - start
+            print(
+                f"{len(body):>7}B {name:<8} {took / rounds * 1e6:8.1f}us -> {len(out):>6}B"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Cost of a config lookup, parsing config.json per call vs the cached config
+
+Usage:
+    python benchmarks/bench_config.py [lookups]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+import config
+
+
+def legacy_load_var(path: str):
+    """The former `load_var`, reading and parsing the whole file per lookup"""
+
+    with open(config.CONFIG_PATH, "r") as rf:
+        data = json.loads(rf.read())
+
+    for p in path.split("."):
+        data = data[p]
+    return data
+
+
+def main() -> None:
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    for name, func in [("legacy", legacy_load_var), ("cached", config.load_var)]:
+        start = time.perf_counter()
+        for _ in range(lookups):
+            func("sky.width")
+            func("webserver.keep_alive_timeout")
+            func("environ")
+        took = time.perf_counter() - start
+        print(f"{name:<7} {took / lookups / 3 * 1e6:8.2f}us/lookup")
+
+
+if __name__ == "__main__":
+    main()
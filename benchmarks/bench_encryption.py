@@ -0,0 +1,79 @@
+"""Throughput of the SECURE encryption modes in MB/s
+
+Usage:
+    python benchmarks/bench_encryption.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from encryption.encryption import AesEncryption, AesStreamEncryption, Encryption
+
+KEY = os.urandom(AesEncryption.key_len())
+IV = os.urandom(AesEncryption.iv_len())
+SIZES = [1024, 64 * 1024, 4 * 1024 * 1024]
+
+
+class LegacyAesEncryption(AesEncryption):
+    """The previous implementation: a fresh CBC context per 16 byte block"""
+
+    def __init__(self, key: bytes, iv: bytes) -> None:
+        super().__init__(key, iv)
+        self._cipher = Cipher(algorithm=algorithms.AES256(key), mode=modes.CBC(iv))
+
+    def encrypt(self, data: bytes) -> bytes:
+        encrypted_data = b""
+        for i in range(0, len(data), 16):
+            encryptor = self._cipher.encryptor()
+            encrypted_data += encryptor.update(data[i : i + 16]) + encryptor.finalize()
+        return encrypted_data
+
+    def decrypt(self, data: bytes) -> bytes:
+        decrypted_data = b""
+        for i in range(0, len(data), 16):
+            decryptor = self._cipher.decryptor()
+            decrypted_data += decryptor.update(data[i : i + 16]) + decryptor.finalize()
+        return decrypted_data
+
+
+def throughput(enc: Encryption, dec: Encryption, size: int) -> float:
+    data = os.urandom(size)
+    rounds = max(1, (8 * 1024 * 1024) // size)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        dec.decrypt(enc.encrypt(data))
+    took = time.perf_counter() - start
+
+    return size * rounds * 2 / took / 1024 / 1024
+
+
+def main() -> None:
+    modes_ = {
+        "legacy": lambda: (LegacyAesEncryption(KEY, IV), LegacyAesEncryption(KEY, IV)),
+        "block": lambda: (AesEncryption(KEY, IV), AesEncryption(KEY, IV)),
+        "stream": lambda: (
+            AesStreamEncryption(KEY, IV, KEY[:16]),
+            AesStreamEncryption(KEY, KEY[:16], IV),
+        ),
+    }
+
+    print(f"{'mode':<8}" + "".join(f"{s // 1024:>10}KB" for s in SIZES))
+    for name, factory in modes_.items():
+        row = []
+        for size in SIZES:
+            if name == "legacy" and size > 64 * 1024:
+                # Quadratic concatenation, would run for minutes
+                row.append(f"{'-':>12}")
+                continue
+            row.append(f"{throughput(*factory(), size):>10.1f}MB")
+        print(f"{name:<8}" + "".join(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Cost of evaluating an automation check, splicing variables and calling eval() vs the compiled Expression
+
+Usage:
+    python benchmarks/bench_expression.py [evaluations]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from backend.expression import Expression
+
+CHECKS: list[tuple[str, dict]] = [
+    ("not $ok", {"ok": True}),
+    (
+        "$temp > 20 and $humidity < 60 or $rain >= 0.5",
+        {"temp": 18.5, "humidity": 72, "rain": 0.1},
+    ),
+    ("len($critical) > 0 and $moisture[0] < 30", {"critical": [], "moisture": [42]}),
+]
+
+
+def legacy_check(check: str, variables: dict) -> bool:
+    """The former check, replacing every variable in the text and evaluating it"""
+
+    for k, v in variables.items():
+        check = check.replace(f"${k}", str(v))
+    return bool(eval(check, {}, {}))
+
+
+def main() -> None:
+    evaluations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    for check, variables in CHECKS:
+        expression = Expression(check)
+        assert legacy_check(check, variables) == bool(expression(variables))
+
+        start = time.perf_counter()
+        for _ in range(evaluations):
+            legacy_check(check, variables)
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(evaluations):
+            bool(expression(variables))
+        compiled = time.perf_counter() - start
+
+        print(
+            f"{check:<50} legacy {legacy / evaluations * 1e6:6.2f}us  "
+            f"compiled {compiled / evaluations * 1e6:6.2f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Bookkeeping cost per saved sky picture, listing and sorting the folder vs the frame store index
+
+Usage:
+    python benchmarks/bench_frames.py [pictures]
+"""
+
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from locations import PL_BFUNC
+
+spec = importlib.util.spec_from_file_location("sky", os.path.join(PL_BFUNC, "sky.py"))
+sky = importlib.util.module_from_spec(spec)  # type: ignore
+spec.loader.exec_module(sky)  # type: ignore
+
+
+def legacy_clean(folder: str, keep: int) -> None:
+    """The former `Sky._clean_pictures`, run before every picture"""
+
+    files = [f for f in os.listdir(folder) if f.endswith(".jpg")]
+    if len(files) <= keep:
+        return
+
+    files.sort(key=lambda x: int(x.split(".")[0]))
+    for f in files[: len(files) - keep]:
+        os.remove(os.path.join(folder, f))
+
+
+def legacy_add(folder: str, keep: int, image) -> None:
+    legacy_clean(folder, keep - 1)
+    cv2.imwrite(os.path.join(folder, f"{time.time_ns()}.jpg"), image)
+
+
+def main() -> None:
+    pictures = int(sys.argv[1]) if len(sys.argv) > 1 else 720
+    # A tiny picture keeps the timing about the bookkeeping, not JPEG encoding
+    image = np.zeros((8, 8, 3), np.uint8)
+
+    for name in ["legacy", "store"]:
+        with tempfile.TemporaryDirectory() as folder:
+            store = sky.FrameStore(folder, pictures)
+            for _ in range(pictures):
+                store.add(image)
+            if name == "store":
+                store = sky.FrameStore(folder, pictures)
+
+            start = time.perf_counter()
+            for _ in range(200):
+                if name == "legacy":
+                    legacy_add(folder, pictures, image)
+                else:
+                    store.add(image)
+            took = time.perf_counter() - start
+            print(f"{name:<7} {took / 200 * 1e6:8.1f}us/picture at {pictures} pictures")
+
+
+if __name__ == "__main__":
+    main()
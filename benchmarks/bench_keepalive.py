@@ -0,0 +1,63 @@
+"""Latency of SECURE requests on a new connection each and on a pooled keep-alive connection
+
+Usage:
+    python benchmarks/bench_keepalive.py [requests]
+"""
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from utils import dumpb
+from webclient.client_request import WebClient, WebMethod
+from webclient.connection_pool import ConnectionPool
+from webserver.webrequest import WebRequest, WebResponse
+from webserver.webserver import WebServer
+
+
+class BenchRequest(WebRequest):
+    def REQUEST(self, path: str, body: dict) -> WebResponse:
+        return WebResponse(200, "OK", body=dumpb(body))
+
+
+def bench(port: int, count: int, pool: ConnectionPool | None) -> list[float]:
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        WebClient("127.0.0.1", port).set_method(WebMethod.POST).set_path(
+            "/bench"
+        ).set_secure(True).set_pool(pool).set_json({"button": 1}).send()
+        samples.append(time.perf_counter() - start)
+
+    return samples
+
+
+def report(name: str, samples: list[float]) -> None:
+    ms = sorted(s * 1000 for s in samples)
+    print(
+        f"{name:<12} mean={statistics.mean(ms):7.2f}ms "
+        f"p50={ms[len(ms) // 2]:7.2f}ms max={ms[-1]:7.2f}ms"
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    srv = WebServer(0, BenchRequest)
+    port = srv._socket.getsockname()[1]
+    srv.start()
+    time.sleep(0.2)
+
+    pool = ConnectionPool()
+    report("connect", bench(port, count, None))
+    report("keep-alive", bench(port, count, pool))
+
+    pool.clear()
+    srv.cleanup()
+
+
+if __name__ == "__main__":
+    main()
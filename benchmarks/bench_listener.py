@@ -0,0 +1,90 @@
+"""Compares the connection latency of the polling listener with the selector based one
+
+Usage:
+    python benchmarks/bench_listener.py [requests]
+"""
+
+import os
+import select
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from encryption.enc_socket import EncryptedSocket
+from utils import dumpb
+from webserver.webrequest import WebRequest, WebResponse
+from webserver.webserver import WebServer
+
+
+class BenchRequest(WebRequest):
+    def REQUEST(self, path: str, body: dict) -> WebResponse:
+        return WebResponse(200, "OK", body=dumpb({"path": path}))
+
+
+class PollingWebServer(WebServer):
+    """The previous listener: `select` with a zero timeout and a 100ms sleep"""
+
+    def _listen(self) -> None:
+        while self._started:
+            readable, _, _ = select.select([self._socket], [], [], 0)
+            if self._socket not in readable:
+                time.sleep(0.1)
+                continue
+
+            conn, addr = self._socket.accept()
+            conn.settimeout(None)
+            self._handle(EncryptedSocket(conn), addr)
+
+        self._socket.close()
+
+
+def request_once(port: int) -> float:
+    start = time.perf_counter()
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        # Kept alive connections would only be closed after the keep-alive timeout
+        sock.sendall(
+            b"GET /bench HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n"
+        )
+        while sock.recv(4096):
+            pass
+    return time.perf_counter() - start
+
+
+def bench(server_type: type[WebServer], count: int) -> list[float]:
+    srv = server_type(0, BenchRequest)
+    port = srv._socket.getsockname()[1]
+    srv.start()
+    time.sleep(0.2)
+
+    samples = []
+    for _ in range(count):
+        samples.append(request_once(port))
+        # Idle gap so every connection arrives while the listener is asleep
+        time.sleep(0.013)
+
+    srv.cleanup()
+    return samples
+
+
+def report(name: str, samples: list[float]) -> None:
+    ms = sorted(s * 1000 for s in samples)
+    print(
+        f"{name:<10} mean={statistics.mean(ms):7.2f}ms "
+        f"p50={ms[len(ms) // 2]:7.2f}ms "
+        f"p99={ms[int(len(ms) * 0.99) - 1]:7.2f}ms "
+        f"max={ms[-1]:7.2f}ms"
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    report("polling", bench(PollingWebServer, count))
+    report("selector", bench(WebServer, count))
+
+
+if __name__ == "__main__":
+    main()
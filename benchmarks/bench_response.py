@@ -0,0 +1,121 @@
+"""Cost of writing a small JSON response header by header and as one message
+
+Usage:
+    python benchmarks/bench_response.py [responses]
+"""
+
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from encryption.enc_socket import EncryptedSocket
+from encryption.encryption import AesEncryption, AesStreamEncryption, NoEncryption
+from utils import dumpb
+from webserver.webrequest import WebRequest, WebResponse
+
+
+class CountingSocket:
+    """Forwards writes to a socket and counts the syscalls"""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self._sock = sock
+        self.writes = 0
+
+    def sendall(self, data: bytes) -> None:
+        self.writes += 1
+        self._sock.sendall(data)
+
+    def sendmsg(self, buffers: list) -> int:
+        self.writes += 1
+        return self._sock.sendmsg(buffers)
+
+    def getpeername(self) -> tuple[str, int]:
+        return self._sock.getpeername()
+
+
+class BenchRequest(WebRequest):
+    def REQUEST(self, path: str, body: dict) -> WebResponse:
+        return WebResponse(200, "OK")
+
+
+def legacy_send(conn: EncryptedSocket, response: WebResponse) -> None:
+    """The former response writer, one send for every line"""
+
+    conn.send(f"HTTP/1.1 {response.code} {response.msg}\n".encode())
+    for k, v in {
+        "Server": "JoaNetAPI",
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Methods": "POST, GET, OPTIONS",
+        "Access-Control-Allow-Headers": "*",
+        "Connection": "keep-alive",
+    }.items():
+        conn.send(f"{k}: {v}\n".encode())
+    body, c_type = response.body
+    conn.send(f"Content-Type: {c_type}\n".encode())
+    conn.send(f"Content-Length: {len(body)}\n".encode())
+    conn.send(b"\n")
+    conn.send(body)
+    conn.flush()
+
+
+def drain(sock: socket.socket) -> None:
+    while sock.recv(1 << 16):
+        pass
+
+
+def tcp_pair() -> tuple[socket.socket, socket.socket]:
+    with socket.create_server(("127.0.0.1", 0)) as srv:
+        a = socket.create_connection(srv.getsockname())
+        b, _ = srv.accept()
+    return a, b
+
+
+def bench(name: str, encryption, count: int) -> None:
+    a, b = tcp_pair()
+    threading.Thread(target=drain, args=(b,), daemon=True).start()
+    counter = CountingSocket(a)
+
+    conn = EncryptedSocket(counter)  # type: ignore
+    conn.update_encryption(encryption())
+    request = BenchRequest(None, conn, ("127.0.0.1", 0), {})
+    request.version = "HTTP/1.1"
+    request.persistent = True
+    request._finish = lambda: None  # type: ignore
+
+    response = WebResponse(200, "OK", body=dumpb({"message": "ok", "value": 1}))
+
+    for label, send in [
+        ("legacy", lambda: legacy_send(conn, response)),
+        ("single", lambda: request._send_response(response)),
+    ]:
+        counter.writes = 0
+        start = time.perf_counter()
+        for _ in range(count):
+            send()
+        took = time.perf_counter() - start
+        print(
+            f"{name:<7} {label:<7} {took / count * 1e6:7.2f}us/response "
+            f"{counter.writes / count:5.1f} writes/response"
+        )
+
+    a.close()
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    logging.disable(logging.INFO)
+
+    key = bytes(32)
+    iv = bytes(16)
+    bench("plain", NoEncryption, count)
+    bench("block", lambda: AesEncryption(key, iv), count)
+    bench("stream", lambda: AesStreamEncryption(key, iv, iv), count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Cost of resolving request path segments, scanning the plugin dicts vs the route table
+
+Usage:
+    python benchmarks/bench_routes.py [plugins] [lookups]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from device.routes import RouteKind, RouteTable
+
+
+def legacy_resolve(
+    outputs: dict, sensors: dict, bfuncs: dict, segment: str
+) -> RouteKind | None:
+    """The former `BackendRequest._handle` order, scanning every dict with `lower()`"""
+
+    if segment.startswith(":"):
+        for name in outputs:
+            if name.lower() == segment.lower().lstrip(":"):
+                return RouteKind.OUTPUT
+    for name in sensors:
+        if name.lower() == segment.lower():
+            return RouteKind.SENSOR
+    for name in bfuncs:
+        if name.lower() == segment.lower():
+            return RouteKind.BFUNC
+    return None
+
+
+def table_resolve(routes: RouteTable, segment: str) -> RouteKind | None:
+    if segment.startswith(":"):
+        if routes.get(RouteKind.OUTPUT, segment.lstrip(":")) is not None:
+            return RouteKind.OUTPUT
+    if routes.get(RouteKind.SENSOR, segment) is not None:
+        return RouteKind.SENSOR
+    if routes.get(RouteKind.BFUNC, segment) is not None:
+        return RouteKind.BFUNC
+    return None
+
+
+def main() -> None:
+    plugins = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    outputs = {f"Output{i}": object() for i in range(plugins // 10)}
+    sensors = {f"Sensor{i}": object() for i in range(plugins // 2)}
+    bfuncs = {f"Func{i}": object() for i in range(plugins - len(sensors))}
+    routes = (
+        RouteTable()
+        .register(RouteKind.OUTPUT, outputs)
+        .register(RouteKind.SENSOR, sensors)
+        .register(RouteKind.BFUNC, bfuncs)
+    )
+
+    segments = [":output3", "sensor7", f"FUNC{len(bfuncs) - 1}", "missing"]
+    for segment in segments:
+        assert legacy_resolve(outputs, sensors, bfuncs, segment) == table_resolve(
+            routes, segment
+        )
+
+    for name, func in [
+        ("legacy", lambda s: legacy_resolve(outputs, sensors, bfuncs, s)),
+        ("table", lambda s: table_resolve(routes, s)),
+    ]:
+        start = time.perf_counter()
+        for _ in range(lookups):
+            for segment in segments:
+                func(segment)
+        took = time.perf_counter() - start
+        print(
+            f"{name:<7} {took / lookups / len(segments) * 1e6:8.2f}us/segment with {plugins} plugins"
+        )
+
+
+if __name__ == "__main__":
+    main()
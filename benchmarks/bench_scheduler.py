@@ -0,0 +1,92 @@
+"""Lateness of scheduled runs, the former 0.2s tick loop vs the deadline heap
+
+Usage:
+    python benchmarks/bench_scheduler.py [schedules] [seconds]
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from backend.interval import Schedule
+
+
+class LegacySchedule:
+    """The former scheduler, ticking every schedule every 0.2s"""
+
+    SLEEP_TIME = 0.2
+
+    def __init__(self, interval: float, executor) -> None:
+        self._interval = interval
+        self._executor = executor
+        self._passed_time = 0.0
+
+    def tick(self, t: float) -> None:
+        self._passed_time += t
+
+        if self._passed_time > self._interval:
+            self._passed_time %= self._interval
+            self._executor()
+
+
+def measure(intervals: list[float], seconds: float, legacy: bool) -> None:
+    lateness: list[float] = []
+    lock = threading.Lock()
+    start = time.monotonic()
+
+    def executor(interval: float):
+        runs = [0]
+
+        def run() -> None:
+            runs[0] += 1
+            with lock:
+                lateness.append(time.monotonic() - start - runs[0] * interval)
+
+        return run
+
+    if legacy:
+        schedules = [LegacySchedule(i, executor(i)) for i in intervals]
+        last = start
+        while time.monotonic() - start < seconds:
+            t = time.monotonic()
+            for s in schedules:
+                s.tick(t - last)
+            last = t
+            time.sleep(LegacySchedule.SLEEP_TIME)
+    else:
+        schedules = [Schedule(i, executor(i)) for i in intervals]
+        for s in schedules:
+            Schedule.add_schedule(s)
+        time.sleep(seconds)
+        for s in schedules:
+            Schedule.remove_schedule(s)
+
+    with lock:
+        ms = sorted(x * 1000 for x in lateness)
+
+    name = "legacy" if legacy else "heap"
+    print(
+        f"{name:<7} runs {len(ms):6d}  "
+        f"lateness mean {sum(ms) / max(1, len(ms)):7.2f}ms  "
+        f"p99 {ms[int(len(ms) * 0.99)] if ms else 0:7.2f}ms"
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    rng = random.Random(0)
+    intervals = [rng.uniform(0.25, 2.0) for _ in range(count)]
+
+    Schedule.start_scheduler()
+    measure(intervals, seconds, True)
+    measure(intervals, seconds, False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Latency of SECURE requests with a full key exchange and with a resumed session
+
+Usage:
+    python benchmarks/bench_secure.py [requests]
+"""
+
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from encryption.session import CLIENT_SESSIONS
+from log import LOG
+from utils import dumpb
+from webclient.client_request import WebClient, WebMethod
+from webserver.webrequest import WebRequest, WebResponse
+from webserver.webserver import WebServer
+
+
+class HandshakeTimes(logging.Handler):
+    """Collects the handshake durations the WebClient logs"""
+
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.samples: list[float] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if record.msg.startswith("SECURE handshake"):
+            self.samples.append(record.args[1] / 1000)  # type: ignore
+
+
+class BenchRequest(WebRequest):
+    def REQUEST(self, path: str, body: dict) -> WebResponse:
+        return WebResponse(200, "OK", body=dumpb(body))
+
+
+def bench(port: int, count: int, resume: bool) -> tuple[list[float], list[float]]:
+    handshakes = HandshakeTimes()
+    LOG.addHandler(handshakes)
+
+    samples = []
+    for _ in range(count):
+        if not resume:
+            CLIENT_SESSIONS.remove(f"127.0.0.1:{port}")
+
+        start = time.perf_counter()
+        WebClient("127.0.0.1", port).set_method(WebMethod.POST).set_path(
+            "/bench"
+        ).set_secure(True).set_json({"button": 1}).send()
+        samples.append(time.perf_counter() - start)
+
+    LOG.removeHandler(handshakes)
+    return handshakes.samples, samples
+
+
+def report(name: str, samples: list[float]) -> None:
+    ms = sorted(s * 1000 for s in samples)
+    print(
+        f"{name:<14} mean={statistics.mean(ms):7.2f}ms "
+        f"p50={ms[len(ms) // 2]:7.2f}ms max={ms[-1]:7.2f}ms"
+    )
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    srv = WebServer(0, BenchRequest)
+    port = srv._socket.getsockname()[1]
+    srv.start()
+    time.sleep(0.2)
+
+    LOG.setLevel(logging.DEBUG)
+    for name, resume in [("key exchange", False), ("resumed", True)]:
+        handshakes, requests = bench(port, count, resume)
+        report(f"{name}", handshakes)
+        report("  request", requests)
+
+    srv.cleanup()
+
+
+if __name__ == "__main__":
+    main()
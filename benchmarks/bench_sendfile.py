@@ -0,0 +1,72 @@
+"""Throughput and peak memory of downloading a large public file, plain and SECURE
+
+Usage:
+    python benchmarks/bench_sendfile.py [megabytes]
+"""
+
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from locations import PUBLIC
+from webclient.client_request import WebClient
+from webserver.webrequest import WebRequest, WebResponse
+from webserver.webserver import WebServer
+
+
+class BenchRequest(WebRequest):
+    def REQUEST(self, path: str, body: dict) -> WebResponse:
+        return WebResponse(404, "NOT_FOUND")
+
+
+class NullSink:
+    def write(self, data) -> int:
+        return len(data)
+
+
+def main() -> None:
+    size = (int(sys.argv[1]) if len(sys.argv) > 1 else 64) * 1024 * 1024
+    logging.disable(logging.INFO)
+
+    path = os.path.join(PUBLIC, "bench.bin")
+    with open(path, "wb") as wf:
+        for _ in range(size // (1024 * 1024)):
+            wf.write(os.urandom(1024 * 1024))
+
+    srv = WebServer(0, BenchRequest)
+    port = srv._socket.getsockname()[1]
+    srv.start()
+    time.sleep(0.2)
+
+    try:
+        for name, secure in [("plain", False), ("secure", True)]:
+            tracemalloc.start()
+            start = time.perf_counter()
+
+            resp = (
+                WebClient("127.0.0.1", port)
+                .set_path("/bench.bin")
+                .set_secure(secure)
+                .send(stream=True)
+            )
+            received = resp.read_into(NullSink())  # type: ignore
+
+            took = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(
+                f"{name:<7} {received / took / 1e6:8.1f} MB/s "
+                f"peak={peak / 1024 / 1024:6.2f} MiB for {size / 1024 / 1024:.0f} MiB"
+            )
+    finally:
+        srv.cleanup()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Cost of rendering a SiteScript page, importing it per request vs the cached registry and template
+
+Usage:
+    python benchmarks/bench_sitescript.py [renders]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from webserver.sitescript import SITE_SCRIPTS, load_script_file
+
+SCRIPT = """
+from webserver.sitescript import SiteScript
+
+
+class BenchPage(SiteScript):
+    def display(self) -> None:
+        for i in range(20):
+            self.page_vars[f"var{i}"] = str(i)
+"""
+
+
+def legacy_render(pldir: str, site: str) -> bytes:
+    """The former request path, importing the script and replacing every variable over the whole page"""
+
+    script = load_script_file(pldir, "page.py")
+    s = script({})  # type: ignore
+    s.display()
+    with open(site, "rb") as rf:
+        content = rf.read()
+    for k, v in s.page_vars.items():
+        content = content.replace(
+            f"%%{k}%%".encode(), v.encode() if isinstance(v, str) else v
+        )
+    return content
+
+
+def cached_render(pldir: str, site: str) -> bytes:
+    script = SITE_SCRIPTS.get(os.path.join(pldir, "page.py"))
+    return script({}).site_read(site)  # type: ignore
+
+
+def main() -> None:
+    renders = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with tempfile.TemporaryDirectory() as pldir:
+        with open(os.path.join(pldir, "page.py"), "w") as wf:
+            wf.write(SCRIPT)
+
+        site = os.path.join(pldir, "page.html")
+        with open(site, "w") as wf:
+            wf.write(
+                "".join(
+                    f"<p>%%var{i % 20}%% {'lorem ipsum ' * 10}</p>" for i in range(400)
+                )
+            )
+
+        assert legacy_render(pldir, site) == cached_render(pldir, site)
+
+        for name, func in [("legacy", legacy_render), ("cached", cached_render)]:
+            start = time.perf_counter()
+            for _ in range(renders):
+                func(pldir, site)
+            took = time.perf_counter() - start
+            print(f"{name:<7} {took / renders * 1e6:8.1f}us/render")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Lookup and read cost of public files, listing and reading the directory vs the static file cache
+
+Usage:
+    python benchmarks/bench_static.py [lookups]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from locations import PUBLIC
+from webserver.static_files import StaticFiles
+
+
+def legacy_find(path: str) -> str | None:
+    """The former `has_public`, listing the directory on every request"""
+
+    for f in os.listdir(PUBLIC):
+        name, ext = os.path.splitext(f)
+        if path.strip("/").lower() in [name.lower(), f.lower()] and ext != ".py":
+            return f
+    return None
+
+
+def legacy_load(fname: str) -> bytes:
+    with open(os.path.join(PUBLIC, fname), "rb") as rf:
+        return rf.read()
+
+
+def timed(name: str, count: int, func) -> None:
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    took = time.perf_counter() - start
+    print(f"{name:<14} {took / count * 1e6:8.2f}us")
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    files = StaticFiles(PUBLIC, 8 * 1024 * 1024)
+
+    timed("listdir find", count, lambda: legacy_find("/favicon.ico"))
+    timed("index find", count, lambda: files.find("/favicon.ico"))
+    timed("read", count, lambda: legacy_load("favicon.ico"))
+    timed("cached load", count, lambda: files.load("favicon.ico"))
+    timed("miss listdir", count, lambda: legacy_find("/sensor.temp"))
+    timed("miss index", count, lambda: files.find("/sensor.temp"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Cost of a timelapse download, re-encoding every saved frame vs the incrementally built timelapse
+
+Usage:
+    python benchmarks/bench_timelapse.py [frames]
+"""
+
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from locations import PL_BFUNC
+
+spec = importlib.util.spec_from_file_location("sky", os.path.join(PL_BFUNC, "sky.py"))
+sky = importlib.util.module_from_spec(spec)  # type: ignore
+spec.loader.exec_module(sky)  # type: ignore
+
+SIZE = (640, 480)
+
+
+def legacy_display(folder: str) -> None:
+    """The former `PublicSky.display`, encoding all frames into one video per download"""
+
+    writer = cv2.VideoWriter(
+        os.path.join(folder, "sky.mp4"), cv2.VideoWriter.fourcc(*"mp4v"), 24.0, SIZE
+    )
+    files = [f for f in os.listdir(folder) if f.endswith(".jpg")]
+    files.sort(key=lambda x: int(x.split(".")[0]))
+
+    for f in files:
+        writer.write(cv2.imread(os.path.join(folder, f)))
+
+    writer.release()
+
+
+def main() -> None:
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 240
+
+    with tempfile.TemporaryDirectory() as folder:
+        noise = np.random.randint(0, 255, (SIZE[1], SIZE[0], 3), np.uint8)
+        images = []
+        for i in range(frames):
+            images.append(np.roll(noise, i * 4, axis=1))
+            cv2.imwrite(os.path.join(folder, f"{i}.jpg"), images[-1])
+
+        start = time.perf_counter()
+        legacy_display(folder)
+        print(f"legacy download  {(time.perf_counter() - start) * 1e3:9.1f}ms")
+
+        timelapse = sky.Timelapse(
+            os.path.join(folder, "sky.ts"), folder, SIZE, 24, frames
+        )
+        start = time.perf_counter()
+        for im in images:
+            timelapse.add_frame(im)
+        took = time.perf_counter() - start
+        print(f"per picture      {took / frames * 1e3:9.2f}ms")
+
+        start = time.perf_counter()
+        for _ in range(1000):
+            window = timelapse.window()
+            if window is not None:
+                window[0].close()
+        took = time.perf_counter() - start
+        print(
+            f"cached download  {took / 1000 * 1e3:9.4f}ms (opening the window, sent by sendfile)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+from backend.sampler import SAMPLER
+from device.api import APIFunct
+
+
+class History(APIFunct):
+    # Only reads samples already taken, never polls a sensor
+    SAFE = True
+
+    def api(self) -> dict | tuple[bytes, str]:
+        if len(self.args) == 0:
+            # Automations import the backend, which is still loading this plugin at import time
+            from backend.automation import QUERIES
+
+            # Sensor polls saved by sharing query results between automations
+            return {"history": SAMPLER.stats(), "queries": QUERIES.stats()}
+
+        try:
+            since = float(self.body.get("since", 0))
+            until = float(self.body["until"]) if "until" in self.body else None
+            points = int(self.body.get("points", 100))
+        except (TypeError, ValueError):
+            return {"history": "since, until and points must be numbers"}
+
+        field = ".".join(self.args[1:]) or None
+        series = SAMPLER.query(self.args[0], field, since, until, points)
+        if series is None:
+            return {"history": f"No history for sensor `{self.args[0]}`"}
+
+        return {"history": {self.args[0]: series}}
@@ -1,4 +1,5 @@
 import logging
+from typing import Any
 from device.api import APIFunct
 from log import LOG
 
@@ -15,19 +16,37 @@ class Log(APIFunct):
                     "message": "No log object was provided!",
                 }
             ip = self.request._conn.sock().getpeername()[0]
-            message: list[str] = [f"Remote log by {ip}:"]
 
-            level: str = log_data.get("level", "INFO").upper()
-            message.append(log_data.get("message", "No message provided!"))
-            exc_trace: str | None = log_data.get("exception")
+            # Frontends send batches, single records are still accepted
+            records: list[dict[str, Any]] = log_data.get("records", [log_data])
+            for record in records:
+                self._log_record(ip, record)
 
-            if exc_trace:
-                message.append(exc_trace)
-
-            log_level = getattr(logging, level, logging.INFO)
-            LOG.log(log_level, "\n".join(message))
+            dropped = int(log_data.get("dropped", 0))
+            if dropped > 0:
+                LOG.warning("Remote log by %s dropped %d records", ip, dropped)
 
         except Exception as e:
             LOG.exception(f"Exception while receiving log from {self.request}")
 
         return {}
+
+    def _log_record(self, ip: str, record: dict[str, Any]) -> None:
+        """Logs a record received from a remote device
+
+        Args:
+            ip (str): The IP of the remote device
+            record (dict[str, Any]): The record with its level, message and exception
+        """
+
+        message: list[str] = [f"Remote log by {ip}:"]
+
+        level: str = record.get("level", "INFO").upper()
+        message.append(record.get("message", "No message provided!"))
+        exc_trace: str | None = record.get("exception")
+
+        if exc_trace:
+            message.append(exc_trace)
+
+        log_level = getattr(logging, level, logging.INFO)
+        LOG.log(log_level, "\n".join(message))
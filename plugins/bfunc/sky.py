@@ -1,9 +1,14 @@
+from collections import deque
+from contextlib import contextmanager
 import io
 import os
 import cv2
+import tempfile
 import time
 import logging
+import threading
 from threading import Thread
+from typing import BinaryIO, Iterator
 
 import requests
 
@@ -11,7 +16,435 @@ from backend.interval import Schedule
 import config
 from device.api import APIFunct
 import locations
-from log import LOG
+from log import LOG, logged_thread
+
+# OpenCV validates the fourcc against the tags of the container, MPEG-TS has none so every tag is reported
+_TAG_WARNING = b"is not supported with codec id"
+
+
+@contextmanager
+def _without_tag_warning() -> Iterator[None]:
+    """Drops the tag warning OpenCV prints to stderr for every segment, other output is passed on"""
+
+    try:
+        saved = os.dup(2)
+    except OSError:
+        # No stderr to filter
+        yield
+        return
+
+    with tempfile.TemporaryFile() as tmp:
+        os.dup2(tmp.fileno(), 2)
+        try:
+            yield
+        finally:
+            os.dup2(saved, 2)
+            os.close(saved)
+
+            tmp.seek(0)
+            for line in tmp:
+                if _TAG_WARNING not in line:
+                    os.write(2, line)
+
+
+class Timelapse:
+    FPS = 24.0
+
+    def __init__(
+        self,
+        path: str,
+        work_dir: str,
+        size: tuple[int, int],
+        segment_frames: int,
+        max_frames: int,
+    ) -> None:
+        """A video built up frame by frame out of MPEG-TS segments appended to one file
+
+        Args:
+            path (str): The file holding the encoded segments
+            work_dir (str): The directory the open segment is encoded in
+            size (tuple[int, int]): Width and height of the video
+            segment_frames (int): Amount of frames encoded into one segment
+            max_frames (int): Amount of frames after which the oldest segments are dropped
+        """
+
+        self._path = path
+        self._segment_path = os.path.join(work_dir, "segment.ts")
+        self._size = size
+        self._segment_frames = segment_frames
+        self._max_frames = max_frames
+        self._lock = threading.Lock()
+
+        # Offset, length and frame count of every segment in the window
+        self._segments: deque[tuple[int, int, int]] = deque()
+        self._frames = 0
+        self._end = 0
+
+        self._writer: cv2.VideoWriter | None = None
+        self._pending = 0
+
+        # Incremented on every reset to stop rebuilding a dropped video
+        self._generation = 0
+
+    def add_frame(self, image) -> None:
+        """Encodes a frame into the open segment, appending the segment once it is full
+
+        Args:
+            image: The frame as read from the camera
+        """
+
+        with self._lock:
+            self._add(image)
+
+    def rebuild(self, images: list[str]) -> None:
+        """Encodes frames saved before this timelapse existed
+
+        Args:
+            images (list[str]): Paths of the frames in chronological order
+        """
+
+        generation = self._generation
+
+        for f in images[-self._max_frames :]:
+            im = cv2.imread(f)
+            if im is None:
+                continue
+
+            with self._lock:
+                if self._generation != generation:
+                    return
+                self._add(im)
+
+        with self._lock:
+            if self._generation == generation:
+                self._close_segment()
+
+    def window(self) -> tuple[BinaryIO, int, int] | None:
+        """Opens the file holding the current video, to be closed by the caller
+
+        Notes:
+            The file is opened with the lock held, so the returned part stays valid
+            while it is sent. Compacting and resetting replace or remove the path
+            but leave the opened file as it was.
+
+        Returns:
+            tuple[BinaryIO, int, int] | None: The opened file, offset and length of the part holding the current video or `None` if there is no video yet
+        """
+
+        with self._lock:
+            if len(self._segments) == 0:
+                return None
+
+            try:
+                file = open(self._path, "rb")
+            except OSError:
+                LOG.exception("Could not open the timelapse")
+                return None
+
+            offset = self._segments[0][0]
+            return file, offset, self._end - offset
+
+    def reset(self) -> None:
+        """Drops all frames of the video"""
+
+        with self._lock:
+            self._generation += 1
+
+            if self._writer is not None:
+                self._writer.release()
+                self._writer = None
+            self._pending = 0
+
+            self._segments.clear()
+            self._frames = 0
+            self._end = 0
+
+            if os.path.isfile(self._path):
+                try:
+                    os.remove(self._path)
+                except OSError:
+                    # Files opened by downloads cannot be removed on Windows,
+                    # new segments go after the old ones until the next compaction
+                    self._end = os.path.getsize(self._path)
+
+    def _add(self, image) -> None:
+        if (image.shape[1], image.shape[0]) != self._size:
+            image = cv2.resize(image, self._size)
+
+        if self._writer is None:
+            with _without_tag_warning():
+                self._writer = cv2.VideoWriter(
+                    self._segment_path,
+                    cv2.VideoWriter.fourcc(*"mp4v"),
+                    Timelapse.FPS,
+                    self._size,
+                )
+
+        self._writer.write(image)
+        self._pending += 1
+
+        if self._pending >= self._segment_frames:
+            self._close_segment()
+
+    def _close_segment(self) -> None:
+        if self._writer is None:
+            return
+
+        self._writer.release()
+        self._writer = None
+
+        # Transport streams stay playable when concatenated
+        with open(self._segment_path, "rb") as rf:
+            segment = rf.read()
+        with open(self._path, "ab") as af:
+            af.write(segment)
+
+        self._segments.append((self._end, len(segment), self._pending))
+        self._end += len(segment)
+        self._frames += self._pending
+        self._pending = 0
+
+        while self._frames > self._max_frames and len(self._segments) > 1:
+            self._frames -= self._segments.popleft()[2]
+
+        # Rewrite the file once more than half of it is outside of the window
+        if self._segments[0][0] > self._end - self._segments[0][0]:
+            self._compact()
+
+    def _compact(self) -> None:
+        offset = self._segments[0][0]
+        tmp = f"{self._path}.tmp"
+
+        with open(self._path, "rb") as rf, open(tmp, "wb") as wf:
+            rf.seek(offset)
+            while chunk := rf.read(1024 * 1024):
+                wf.write(chunk)
+
+        # Downloads keep sending from the old file they opened
+        try:
+            os.replace(tmp, self._path)
+        except OSError:
+            # Windows refuses to replace open files, compacting is retried with the next segment
+            LOG.debug("Could not compact the timelapse while it is downloaded")
+            os.remove(tmp)
+            return
+
+        self._segments = deque(
+            (o - offset, length, n) for o, length, n in self._segments
+        )
+        self._end -= offset
+
+
+class Camera:
+    # Seconds after which a new frame is decoded for the shared buffer
+    REFRESH = 1.0
+
+    def __init__(
+        self, source: int | str, props: dict[int, float], idle_timeout: float
+    ) -> None:
+        """A capture worker owning the camera, keeping the latest frame for all readers
+
+        Args:
+            source (int | str): The camera index or video source
+            props (dict[int, float]): Capture properties applied once after opening
+            idle_timeout (float): Seconds without a reader after which the camera is released
+        """
+
+        self._source = source
+        self._props = props
+        self._idle_timeout = idle_timeout
+        self._cond = threading.Condition()
+
+        self._running = False
+        self._stopped = False
+        self._failed = False
+        self._last_used = 0.0
+        self._waiting = 0
+
+        self._frame = None
+        self._frame_time = 0.0
+
+    def frame(self, timeout: float = 5.0):
+        """Gets a frame not older than `REFRESH` seconds, opening the camera if needed
+
+        Args:
+            timeout (float, optional): Seconds to wait for a frame. Defaults to 5.0.
+
+        Returns:
+            The latest frame or `None` if the camera could not be opened or read
+        """
+
+        with self._cond:
+            requested = time.monotonic()
+            self._last_used = requested
+            self._stopped = False
+
+            if (
+                self._frame is not None
+                and requested - self._frame_time < Camera.REFRESH
+            ):
+                return self._frame
+
+            if not self._running:
+                self._running = True
+                self._failed = False
+                logged_thread(name="Sky camera", target=self._run).start()
+
+            self._waiting += 1
+            try:
+                fresh = self._cond.wait_for(
+                    lambda: self._frame_time >= requested or self._failed, timeout
+                )
+            finally:
+                self._waiting -= 1
+
+            return self._frame if fresh and not self._failed else None
+
+    def stop(self) -> None:
+        """Releases the camera, the next reader opens it again"""
+
+        with self._cond:
+            self._stopped = True
+
+    def _run(self) -> None:
+        while True:
+            self._capture()
+
+            with self._cond:
+                # Readers arriving while the camera was released open it again
+                if self._waiting == 0 or self._failed:
+                    self._running = False
+                    self._cond.notify_all()
+                    return
+
+    def _capture(self) -> None:
+        cap = cv2.VideoCapture(self._source)
+
+        try:
+            if not cap.isOpened():
+                LOG.warning("Camera could not be opened!")
+                self._fail()
+                return
+
+            for n, i in self._props.items():
+                cap.set(n, i)
+
+            # Grabbing without decoding keeps the driver's buffers fresh and exposure adjusted
+            while True:
+                if not cap.grab():
+                    LOG.warning("Image could not be taken")
+                    self._fail()
+                    return
+
+                now = time.monotonic()
+
+                with self._cond:
+                    if self._stopped or now - self._last_used > self._idle_timeout:
+                        break
+                    decode = (
+                        self._waiting > 0 or now - self._frame_time >= Camera.REFRESH
+                    )
+
+                if not decode:
+                    continue
+
+                result, image = cap.retrieve()
+                with self._cond:
+                    if result:
+                        self._frame = image
+                        self._frame_time = now
+                    self._cond.notify_all()
+        finally:
+            cap.release()
+
+    def _fail(self) -> None:
+        with self._cond:
+            self._failed = True
+            self._frame = None
+            self._frame_time = 0.0
+            self._cond.notify_all()
+
+
+class FrameStore:
+    def __init__(self, folder: str, capacity: int) -> None:
+        """The saved pictures of a folder, indexed by their capture time in milliseconds
+
+        Args:
+            folder (str): The folder the pictures are saved in as `<time>.jpg`
+            capacity (int): Amount of pictures after which the oldest is removed
+        """
+
+        self._folder = folder
+        self._capacity = capacity
+        self._lock = threading.Lock()
+
+        # The folder is listed only once, every later change goes through the index
+        times = []
+        for f in os.listdir(folder):
+            name, ext = os.path.splitext(f)
+            if ext == ".jpg" and name.isdigit():
+                times.append(int(name))
+        self._times: deque[int] = deque(sorted(times))
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def path(self, t: int) -> str:
+        """
+        Args:
+            t (int): The capture time of the picture
+
+        Returns:
+            str: The path of the picture
+        """
+
+        return os.path.join(self._folder, f"{t}.jpg")
+
+    def paths(self) -> list[str]:
+        """
+        Returns:
+            list[str]: The paths of all pictures from oldest to newest
+        """
+
+        with self._lock:
+            return [self.path(t) for t in self._times]
+
+    def add(self, image) -> str:
+        """Saves a picture, removing the oldest ones beyond the capacity
+
+        Args:
+            image: The picture as read from the camera
+
+        Returns:
+            str: The path the picture was saved at
+        """
+
+        with self._lock:
+            t = int(time.time() * 1000)
+            if len(self._times) > 0 and t <= self._times[-1]:
+                t = self._times[-1] + 1
+
+            path = self.path(t)
+            cv2.imwrite(path, image)
+            self._times.append(t)
+
+            while len(self._times) > self._capacity:
+                self._remove(self._times.popleft())
+
+        return path
+
+    def clear(self) -> None:
+        """Removes all pictures"""
+
+        with self._lock:
+            while len(self._times) > 0:
+                self._remove(self._times.popleft())
+
+    def _remove(self, t: int) -> None:
+        try:
+            os.remove(self.path(t))
+        except FileNotFoundError:
+            pass
 
 
 class Sky(APIFunct):
@@ -22,8 +455,71 @@ class Sky(APIFunct):
     SAVE_TIME: int = config.load_var("sky.save_time")  # type: ignore
     SAVE_FOLDER = os.path.join(locations.ROOT, config.load_var("sky.save_folder"))  # type: ignore
 
+    SEGMENT_FRAMES: int = config.load_var("sky.segment_frames")  # type: ignore
+
     FULL = False
     SCHEDULE: Schedule | None = None
+    TIMELAPSE: Timelapse | None = None
+    CAMERA_WORKER: Camera | None = None
+    FRAMES: FrameStore | None = None
+    # Requests and the schedule may create the workers above at the same time, `timelapse` nests `frames`
+    _lock = threading.RLock()
+
+    @staticmethod
+    def frames() -> FrameStore:
+        """
+        Returns:
+            FrameStore: The saved pictures, read from the folder on first use
+        """
+
+        with Sky._lock:
+            if Sky.FRAMES is None:
+                Sky.FRAMES = FrameStore(Sky.SAVE_FOLDER, Sky.SAVE_TIME)
+
+            return Sky.FRAMES
+
+    @staticmethod
+    def camera() -> Camera:
+        """
+        Returns:
+            Camera: The capture worker, kept open while pictures are taken regularly
+        """
+
+        with Sky._lock:
+            if Sky.CAMERA_WORKER is None:
+                Sky.CAMERA_WORKER = Camera(
+                    Sky.CAMERA, Sky._props(), max(3 * Sky.INTERVAL, 60)
+                )
+
+            return Sky.CAMERA_WORKER
+
+    @staticmethod
+    def timelapse() -> Timelapse:
+        """
+        Returns:
+            Timelapse: The timelapse of the saved pictures, encoding pictures saved before in the background
+        """
+
+        with Sky._lock:
+            if Sky.TIMELAPSE is None:
+                Sky.TIMELAPSE = Timelapse(
+                    os.path.join(locations.PUBLIC, "sky.ts"),
+                    Sky.SAVE_FOLDER,
+                    (Sky.WIDTH, Sky.HEIGHT),
+                    Sky.SEGMENT_FRAMES,
+                    Sky.SAVE_TIME,
+                )
+                Sky.TIMELAPSE.reset()
+
+                images = Sky.frames().paths()
+                if len(images) > 0:
+                    logged_thread(
+                        name="Timelapse rebuild",
+                        target=Sky.TIMELAPSE.rebuild,
+                        args=(images,),
+                    ).start()
+
+            return Sky.TIMELAPSE
 
     def api(self) -> dict | tuple[bytes, str]:
         if len(self.args) > 0:
@@ -37,12 +533,14 @@ class Sky(APIFunct):
                 case _:
                     return {"sky": "Method not found"}
 
-        return {"sky": {"files": len(self._images())}}
+        return {"sky": {"files": len(Sky.frames())}}
 
     def stop(self) -> dict | tuple[bytes, str]:
         if Sky.SCHEDULE is not None:
             Schedule.remove_schedule(Sky.SCHEDULE)
             Sky.SCHEDULE = None
+            if Sky.CAMERA_WORKER is not None:
+                Sky.CAMERA_WORKER.stop()
 
             return {"sky": "Stopped"}
         return {"sky": "No instance running"}
@@ -52,22 +550,15 @@ class Sky(APIFunct):
             Sky.SCHEDULE = Schedule(self.INTERVAL, self.take_picture)
             Schedule.add_schedule(Sky.SCHEDULE)
 
-            for f in self._images():
-                os.remove(os.path.join(self.SAVE_FOLDER, f))
+            Sky.frames().clear()
+            Sky.timelapse().reset()
 
             return {"sky": "Started"}
         return {"sky": "Instance already running"}
 
     def preview(self) -> dict[str, str] | tuple[bytes, str]:
-        cap = cv2.VideoCapture(self.CAMERA)
-        if not cap.isOpened():
-            return {"sky": "Camera could not be opened!"}
-
-        self._set_props(cap)
-
-        result, image = cap.read()
-
-        if not result:
+        image = Sky.camera().frame()
+        if image is None:
             return {"sky": "Image could not be taken"}
 
         result, buff = cv2.imencode(".jpg", image)
@@ -77,14 +568,9 @@ class Sky(APIFunct):
 
         return (buff.tobytes(), "image/jpeg")
 
-    def _images(self) -> list[str]:
-        return [f for f in os.listdir(self.SAVE_FOLDER) if f.endswith(".jpg")]
-
     def _clean_pictures(self) -> None:
-        f_keep = self.SAVE_TIME - 1
-        files = self._images()
-
-        if len(files) <= f_keep:
+        # The store removes the oldest pictures itself, only the notification is left
+        if len(Sky.frames()) < self.SAVE_TIME:
             return
 
         if not self.FULL:
@@ -99,25 +585,18 @@ class Sky(APIFunct):
                 },
             )
 
-        files.sort(key=lambda x: int(x.split(".")[0]))
-        files_to_delete = len(files) - f_keep
-
-        for i in range(files_to_delete):
-            file_to_delete = os.path.join(self.SAVE_FOLDER, files[i])
-            os.remove(file_to_delete)
-
-    def _set_props(self, cap) -> None:
-        for n, i in {
+    @staticmethod
+    def _props() -> dict[int, float]:
+        return {
             cv2.CAP_PROP_BRIGHTNESS: 128,
             cv2.CAP_PROP_CONTRAST: 32,
             cv2.CAP_PROP_EXPOSURE: 166,
             cv2.CAP_PROP_GAIN: 64,
             cv2.CAP_PROP_SATURATION: 32,
             cv2.CAP_PROP_TEMPERATURE: 5500,
-            cv2.CAP_PROP_FRAME_WIDTH: self.WIDTH,
-            cv2.CAP_PROP_FRAME_HEIGHT: self.HEIGHT,
-        }.items():
-            cap.set(n, i)
+            cv2.CAP_PROP_FRAME_WIDTH: Sky.WIDTH,
+            cv2.CAP_PROP_FRAME_HEIGHT: Sky.HEIGHT,
+        }
 
     def take_picture(self) -> None:
         # t = time.time() + self.TIMEZONE % 86400
@@ -126,21 +605,14 @@ class Sky(APIFunct):
 
         self._clean_pictures()
 
-        cap = cv2.VideoCapture(self.CAMERA)
-        if not cap.isOpened():
-            LOG.warning("Camera could not be opened!")
-            return
-
-        self._set_props(cap)
+        # Snapshot of the running capture instead of opening the camera per picture
+        image = Sky.camera().frame()
 
-        result, image = cap.read()
-
-        if not result:
+        if image is None:
             LOG.warning("Image could not be taken")
             self.stop()
             return
 
-        f = os.path.join(locations.ROOT, f"../sky/{int(time.time() * 1000)}.jpg")
-        cv2.imwrite(f, image)
+        Sky.frames().add(image)
+        Sky.timelapse().add_frame(image)
         # LOGGER.info(f"Saving image {f}")
-        cap.release()
@@ -14,6 +14,7 @@ from log import LOG
 
 class Plants(Sensor):
     COUNT = 2
+    SAMPLE_INTERVAL = 300
 
     def __init__(self) -> None:
         super().__init__(30)
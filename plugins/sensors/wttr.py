@@ -9,6 +9,9 @@ import utils
 
 
 class Wttr(Sensor):
+    # Open-Meteo updates its current weather every 15 minutes
+    SAMPLE_INTERVAL = 900
+
     def __init__(self, repoll_after: float = 5) -> None:
         super().__init__(repoll_after)
         self.lat = 48.9333
@@ -2,12 +2,16 @@ from enum import Enum
 import json
 import logging
 import os
-from typing import Any
+import threading
+import time
+from typing import Any, Callable
 
-from backend.backend import BFUNC
-from backend.interval import Schedule
+from backend.backend import ROUTES
+from backend.expression import Expression, ExpressionError, substitute
+from backend.interval import Overrun, Schedule
 from backend.output import OUTPUTS
-from backend.sensor import SENSORS
+import config
+from device.routes import RouteKind
 import locations
 import utils
 
@@ -20,6 +24,89 @@ class AutomationState(Enum):
     WAITING = 1
 
 
+class _Query:
+    def __init__(self, at: float) -> None:
+        self.at = at
+        self.done = threading.Event()
+        self.result: dict[str, Any] = {}
+        self.error: Exception | None = None
+
+
+class QueryCoalescer:
+    WINDOW = 1.0
+
+    def __init__(self, window: float) -> None:
+        """Resolves every distinct sensor query once per window and hands the result to all automations asking for it
+
+        Args:
+            window (float): Seconds a resolved query is reused for
+        """
+
+        self._window = window
+        self._lock = threading.Lock()
+        self._queries: dict[tuple[str, ...], _Query] = {}
+
+        self._requested = 0
+        self._saved = 0
+
+    def query(
+        self, key: tuple[str, ...], resolve: Callable[[], dict[str, Any]]
+    ) -> dict[str, Any]:
+        """
+        Args:
+            key (tuple[str, ...]): Identifies the query, e.g. sensor, arguments and body
+            resolve (Callable[[], dict[str, Any]]): Resolves the query if it is not resolved within this window
+
+        Returns:
+            dict[str, Any]: The result of the query, shared with every other caller of this window
+        """
+
+        now = time.monotonic()
+
+        with self._lock:
+            self._requested += 1
+
+            query = self._queries.get(key)
+            owner = query is None or now - query.at >= self._window
+            if owner:
+                self._queries = {
+                    k: q for k, q in self._queries.items() if now - q.at < self._window
+                }
+                query = self._queries[key] = _Query(now)
+            else:
+                self._saved += 1
+
+        if owner:
+            try:
+                query.result = resolve()
+            except Exception as e:
+                query.error = e
+                raise
+            finally:
+                query.done.set()
+        else:
+            # Another automation may still be resolving the query
+            query.done.wait()
+            if query.error is not None:
+                raise query.error
+
+        return query.result
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns:
+            dict[str, int]: Amount of queries requested and of sensor polls saved by reusing a result
+        """
+
+        with self._lock:
+            return {"requested": self._requested, "saved": self._saved}
+
+
+QUERIES = QueryCoalescer(
+    float(config.load_var("automations.window", QueryCoalescer.WINDOW))
+)
+
+
 class Automation:
     @staticmethod
     def load_all() -> None:
@@ -36,6 +123,7 @@ class Automation:
                 return
 
             Schedule.add_schedule(automation.schedule)
+            TRIGGERS.add(automation)
 
     @staticmethod
     def _load_by_str(data: str) -> "Automation | None":
@@ -49,34 +137,44 @@ class Automation:
             pass
         except json.JSONDecodeError:
             pass
+        except ExpressionError as e:
+            LOG.warning("Invalid check: %s", e)
 
     def __init__(self, data: dict[str, Any]) -> None:
         self._state: AutomationState = AutomationState.NORMAL
 
         self._title: str = data["title"]
-        self._frequency: float = data["frequency"]
+        self._frequency: float | None = data.get("frequency")
         self._if: dict[str, Any] = data["if"]
         self._then: list[dict[str, Any]] = data["then"]
         self._wait: dict[str, Any] = data.get("wait", {})
 
-        self._vars: dict[str, Any] = {}
-
-        self.schedule = Schedule(self._frequency, self.tick)
+        # Checks are compiled once here instead of on every tick
+        self._if_check = Expression(self._if["check"])
+        self._wait_check = Expression(self._wait["check"]) if self._wait else None
 
-    def _inject_vars(self, varstr: str) -> str:
-        """Replaces all variables in the given string with their declared values
+        # Sensors or sensor fields (`sensor.field`) whose changes run the automation
+        on = data.get("on", [])
+        self.triggers: list[str] = [on] if isinstance(on, str) else list(on)
+        if self._frequency is None and len(self.triggers) == 0:
+            raise KeyError("frequency")
 
-        Args:
-            varstr (str): The string containing the variable names
+        self._vars: dict[str, Any] = {}
 
-        Returns:
-            str: The input string replaced with the given variables
-        """
+        # Changes during a run must not get lost, so triggered automations run once more after it
+        self.schedule = Schedule(
+            self._frequency,
+            self.tick,
+            Overrun.COALESCE if len(self.triggers) > 0 else Overrun.SKIP,
+        )
 
-        for k, v in self._vars.items():
-            varstr = varstr.replace(k, str(v))
+    @property
+    def title(self) -> str:
+        return self._title
 
-        return varstr
+    @property
+    def frequency(self) -> float | None:
+        return self._frequency
 
     def _load_vars(self, body: dict[str, Any], result: dict) -> None:
         """Loads all variables the user wants to declare
@@ -88,20 +186,20 @@ class Automation:
 
         for k, v in body.items():
             if k.startswith("$"):
-                self._vars[k] = utils.load_dict_var(result, v)
+                self._vars[k[1:]] = utils.load_dict_var(result, v)
 
-    def check(self, body: dict[str, Any]) -> bool:
+    def check(self, body: dict[str, Any], expression: Expression) -> bool:
         """Checks either the `IF` of the `WAIT` portion
 
         Args:
             body (dict[str, Any]): The body of the action to check
+            expression (Expression): The compiled check of the body
 
         Returns:
             bool: Whether the check succeeded
         """
 
         path: list[str] = [i for i in body["query"].split("/") if len(i) > 0]
-        check: str = body["check"]
         result: dict = {}
 
         for p in path:
@@ -109,20 +207,16 @@ class Automation:
 
         self._load_vars(body, result)
 
-        check = self._inject_vars(check)
-
-        return bool(eval(check, {}, {}))
+        return bool(expression(self._vars))
 
     def then(self) -> None:
         """Executes the `THEN` part of the automation"""
 
         for r in self._then:
             path: list[str] = [i for i in r["path"].split("/") if len(i) > 0]
-            body: dict[str, Any] = r.get("body", {})
-
-            for k, v in body.items():
-                if isinstance(v, str):
-                    body[k] = self._inject_vars(v)
+            body: dict[str, Any] = {
+                k: substitute(v, self._vars) for k, v in r.get("body", {}).items()
+            }
 
             for p in path:
                 self._execute_backend(p.split("."), body)
@@ -135,16 +229,15 @@ class Automation:
             body (dict): Body for the current command
         """
 
-        for name, fclass in BFUNC.items():
-            if name.lower() == fargs[0].lower():
-                fclass(None, fargs[1:], body).api()
-
-                return
+        fclass = ROUTES.get(RouteKind.BFUNC, fargs[0])
+        if fclass is not None:
+            fclass(None, fargs[1:], body).api()
+            return
 
         LOG.warning("[%s] Could not find BFunc for `%s`!", self._title, ".".join(fargs))
 
     def _query_sensor(self, fargs: list[str], body: dict) -> dict[str, Any]:
-        """Query a sensor without needing a WebRequest
+        """Query a sensor without needing a WebRequest, shared with other automations of the same window
 
         Args:
             fargs (list[str]): Arguments of the current command
@@ -154,18 +247,35 @@ class Automation:
             dict[str, Any]: Response body
         """
 
-        for name, inst in SENSORS.items():
-            if name.lower() == fargs[0].lower():
-                inst.tpoll()
-                if inst.data is None:
-                    continue
+        key = (
+            fargs[0].lower(),
+            *fargs[1:],
+            json.dumps(body, sort_keys=True, default=str),
+        )
+        return QUERIES.query(key, lambda: self._resolve_sensor(fargs, body))
 
-                out = OUTPUTS["default"](body)
-                inst.to(out, fargs[1:])
+    def _resolve_sensor(self, fargs: list[str], body: dict) -> dict[str, Any]:
+        """
+        Args:
+            fargs (list[str]): Arguments of the current command
+            body (dict): Body for the current command
+
+        Returns:
+            dict[str, Any]: Response body
+        """
 
-                return out.api_resp()
+        inst = ROUTES.get(RouteKind.SENSOR, fargs[0])
+        if inst is None:
+            return {}
 
-        return {}
+        inst.tpoll()
+        if inst.data is None:
+            return {}
+
+        out = OUTPUTS["default"](body)
+        inst.to(out, fargs[1:])
+
+        return out.api_resp()
 
     def tick(self) -> None:
         """Executes a tick of the automation"""
@@ -173,15 +283,87 @@ class Automation:
         try:
             if self._state == AutomationState.NORMAL:
                 LOG.debug("Checking IF tick for %s", self._title)
-                if self.check(self._if):  # Execute IF part
+                if self.check(self._if, self._if_check):  # Execute IF part
                     LOG.debug("Executing THEN for %s", self._title)
                     self.then()  # Execute THEN part
                     self._state = AutomationState.WAITING
 
             elif self._state == AutomationState.WAITING:
                 LOG.debug("Checking WAIT tick for %s", self._title)
-                if self.check(self._wait):  # Execute WAIT part
+                if self._wait_check is not None and self.check(
+                    self._wait, self._wait_check
+                ):  # Execute WAIT part
                     self._state = AutomationState.NORMAL
 
         except:
             LOG.exception("Failed tick:")
+
+
+class TriggerIndex:
+    def __init__(self) -> None:
+        """Index from sensors and their fields to the automations triggered by their changes"""
+
+        self._lock = threading.Lock()
+        self._index: dict[str, dict[str | None, list[Automation]]] = {}
+        self._subscribed: set[str] = set()
+
+    def add(self, automation: Automation) -> None:
+        """Subscribes an automation to the changes of its triggers
+
+        Args:
+            automation (Automation): The automation to add
+        """
+
+        for trigger in automation.triggers:
+            name, _, field = trigger.partition(".")
+            name = name.lower()
+            sensor = ROUTES.get(RouteKind.SENSOR, name)
+            if sensor is None:
+                LOG.warning(
+                    "[%s] Could not find sensor `%s` to trigger on",
+                    automation.title,
+                    name,
+                )
+                continue
+
+            if sensor.SAMPLE_INTERVAL is None and automation.frequency is None:
+                LOG.warning(
+                    "[%s] `%s` is not sampled, changes are only seen when it is polled otherwise",
+                    automation.title,
+                    name,
+                )
+
+            with self._lock:
+                fields = self._index.setdefault(name, {})
+                fields.setdefault(field or None, []).append(automation)
+
+                subscribe = name not in self._subscribed
+                self._subscribed.add(name)
+
+            if subscribe:
+                sensor.subscribe(
+                    lambda changed, name=name: self._changed(name, changed)
+                )
+
+    def _changed(self, name: str, changed: set[str]) -> None:
+        """Triggers the automations depending on the changed fields of a sensor
+
+        Args:
+            name (str): The name of the sensor
+            changed (set[str]): The changed fields
+        """
+
+        with self._lock:
+            fields = self._index.get(name, {})
+            affected: dict[Automation, None] = {}
+
+            for field in (None, *changed):
+                for automation in fields.get(field, ()):
+                    affected[automation] = None
+
+        for automation in affected:
+            LOG.debug("Triggering %s by changes of %s", automation.title, name)
+            Schedule.trigger(automation.schedule)
+
+
+TRIGGERS = TriggerIndex()
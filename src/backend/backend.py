@@ -1,18 +1,23 @@
 import json
 import logging
-from socket import socket
+import threading
+import time
 import traceback
 import urllib.parse
 from typing import Any, Type
 
+import config
 from device import api
 from device.permissions import DefaultPermissions, PermissionLevel
 from utils import dumpb
 from device.api import APIFunct
 from device.device import Device
+from device.routes import RouteKind, RouteTable
+from encryption.enc_socket import EncryptedSocket
 from backend.sensor import SENSORS
 from locations import PL_BFUNC
 from backend.output import OUTPUTS, OutputDevice
+from proj_types.worker_pool import WorkerPool
 from webserver.webrequest import WebRequest, WebResponse
 
 
@@ -21,6 +26,13 @@ from log import LOG
 
 BFUNC: dict[str, Type[APIFunct]] = api.load_dir(PL_BFUNC)
 
+ROUTES = (
+    RouteTable()
+    .register(RouteKind.OUTPUT, OUTPUTS)
+    .register(RouteKind.SENSOR, SENSORS)
+    .register(RouteKind.BFUNC, BFUNC)
+)
+
 DEVICES: dict[str, Device] = {}
 
 
@@ -34,9 +46,59 @@ class FinishError(RuntimeError):
         return self._response
 
 
+class Segment:
+    def __init__(self, fargs: list[str], kind: RouteKind, handler: Any) -> None:
+        """A read-only path segment run on the fan-out pool
+
+        Args:
+            fargs (list[str]): Arguments of the segment
+            kind (RouteKind): Whether the segment reads a sensor or calls a safe backend function
+            handler (Any): The sensor instance or backend function class
+        """
+
+        self.fargs = fargs
+        self.kind = kind
+        self.handler = handler
+
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: str | None = None
+
+    def run(
+        self, request: "BackendRequest", body: dict, outputtype: Type[OutputDevice]
+    ) -> None:
+        """Runs the segment, keeping its result or traceback for the request to merge
+
+        Args:
+            request (BackendRequest): The request the segment belongs to
+            body (dict): Body of the request
+            outputtype (Type[OutputDevice]): The output device selected before the segment
+        """
+
+        try:
+            if self.kind == RouteKind.SENSOR:
+                self.handler.tpoll()
+                if self.handler.data is not None:
+                    out = outputtype(body)
+                    self.handler.to(out, self.fargs[1:])
+                    self.result = out
+            else:
+                self.result = self.handler(request, self.fargs[1:], body).api()
+        except Exception:
+            self.error = traceback.format_exc()
+        finally:
+            self.done.set()
+
+
 class BackendRequest(WebRequest):
+    FANOUT_WORKERS = 4
+    SEGMENT_TIMEOUT = 10.0
+
+    _fanout: WorkerPool | None = None
+    _fanout_lock = threading.Lock()
+
     def __init__(
-        self, parent, conn: socket, addr: tuple[str, int], args: dict[str, Any]
+        self, parent, conn: EncryptedSocket, addr: tuple[str, int], args: dict[str, Any]
     ) -> None:
         super().__init__(parent, conn, addr, args)
 
@@ -59,16 +121,26 @@ class BackendRequest(WebRequest):
 
         Notes:
             Method awaits refactoring [TODO]
+
+            With `parallel` set in the query or body, consecutive sensor reads and
+            safe backend functions run concurrently and are merged in path order.
         """
 
         path: str = urllib.parse.unquote(pth)
+        segments = [k.split(".") for k in path.split("/")[1:] if len(k) > 0]
+        parallel = body.get("parallel") is True
 
-        for k in path.split("/")[1:]:
-            if len(k) == 0:
-                continue
-            fargs = k.split(".")
+        i = 0
+        while i < len(segments):
+            fargs = segments[i]
 
             try:
+                batch = self._parallel_segments(segments, i) if parallel else []
+                if len(batch) > 1:
+                    self._run_parallel(batch, body)
+                    i += len(batch)
+                    continue
+
                 if r := self._handle(fargs, body):
                     return r
 
@@ -77,16 +149,9 @@ class BackendRequest(WebRequest):
 
             except Exception:
                 LOG.exception(f"Exception on {".".join(fargs)}")
-                return WebResponse(
-                    500,
-                    "FUNC_FAILED",
-                    body=dumpb(
-                        {
-                            "message": f"Function `{".".join(fargs)}` failed!",
-                            "exception": traceback.format_exc(),
-                        }
-                    ),
-                )
+                return self._func_failed(fargs, traceback.format_exc())
+
+            i += 1
 
         return WebResponse(
             *self.code,
@@ -98,6 +163,133 @@ class BackendRequest(WebRequest):
             ),
         )
 
+    def _func_failed(self, fargs: list[str], trace: str) -> WebResponse:
+        return WebResponse(
+            500,
+            "FUNC_FAILED",
+            body=dumpb(
+                {
+                    "message": f"Function `{'.'.join(fargs)}` failed!",
+                    "exception": trace,
+                }
+            ),
+        )
+
+    @staticmethod
+    def fanout() -> WorkerPool:
+        """
+        Returns:
+            WorkerPool: The pool shared by all requests running segments in parallel
+        """
+
+        with BackendRequest._fanout_lock:
+            if BackendRequest._fanout is None:
+                workers = int(
+                    config.load_var("fanout.workers", BackendRequest.FANOUT_WORKERS)
+                )
+                BackendRequest._fanout = WorkerPool("Fanout", workers, workers * 4)
+
+            return BackendRequest._fanout
+
+    def _parallel_segments(self, segments: list[list[str]], start: int) -> list[Segment]:
+        """Collects the read-only segments following `start` that may run concurrently
+
+        Args:
+            segments (list[list[str]]): Arguments of all segments of the path
+            start (int): Index of the first segment
+
+        Raises:
+            FinishError: Immediate response upon an invalid token or missing permissions
+
+        Returns:
+            list[Segment]: The segments, empty if the first one has to run on its own
+        """
+
+        self._get_device()
+
+        batch: list[Segment] = []
+        for fargs in segments[start:]:
+            if fargs[0] == "login" or fargs[0].startswith(":"):
+                break
+
+            # Outputs are only addressed with a `:` prefix
+            routes = [r for r in ROUTES.resolve(fargs[0]) if r[0] != RouteKind.OUTPUT]
+            if len(routes) == 0:
+                break
+
+            kind, handler = routes[0]
+            if kind == RouteKind.BFUNC and getattr(handler, "SAFE", False):
+                self._check_permissions(50, fargs)
+            elif kind != RouteKind.SENSOR:
+                break
+
+            batch.append(Segment(fargs, kind, handler))
+
+        return batch
+
+    def _run_parallel(self, batch: list[Segment], body: dict) -> None:
+        """Runs the segments on the fan-out pool and merges their results in path order
+
+        Args:
+            batch (list[Segment]): The segments to run
+            body (dict): Body of current connection
+
+        Raises:
+            FinishError: Immediate response upon a failed or timed out segment
+        """
+
+        pool = BackendRequest.fanout()
+        for s in batch:
+            # Segments must not see each other's changes to the body
+            args = (self, dict(body), self.outputtype)
+            if not pool.submit(s.run, args):
+                s.run(*args)
+
+        timeout = float(
+            config.load_var("fanout.timeout", BackendRequest.SEGMENT_TIMEOUT)
+        )
+        deadline = time.monotonic() + timeout
+
+        for s in batch:
+            if not s.done.wait(max(0.0, deadline - time.monotonic())):
+                raise FinishError(
+                    WebResponse(
+                        504,
+                        "FUNC_TIMEOUT",
+                        body=dumpb(
+                            {
+                                "message": f"Function `{'.'.join(s.fargs)}` timed out after {timeout}s!"
+                            }
+                        ),
+                    )
+                )
+
+            if s.error is not None:
+                LOG.error("Exception on %s:\n%s", ".".join(s.fargs), s.error)
+                raise FinishError(self._func_failed(s.fargs, s.error))
+
+            if s.kind == RouteKind.SENSOR:
+                if s.result is None:
+                    # No data, the segment might address something else with this name
+                    self._handle(s.fargs, body)
+                else:
+                    self._merge_output(s.result)
+            else:
+                self._merge_result(s.result)
+
+    def _merge_output(self, out: OutputDevice) -> None:
+        if type(self.response) == dict:
+            self.response |= out.api_resp()
+            self.headers |= out.api_headers()
+            self.code = out.api_response(self.code)
+
+    def _merge_result(self, res: dict | tuple[bytes, str]) -> None:
+        if isinstance(self.response, dict):
+            if isinstance(res, dict):
+                self.response |= res
+            else:
+                self.response = res
+
     def _login(self, body: dict):
         """Performs a login using the arguments given in the body
 
@@ -165,10 +357,10 @@ class BackendRequest(WebRequest):
         """
 
         if fargs[0].startswith(":"):
-            for name, oclass in OUTPUTS.items():
-                if name.lower() == fargs[0].lower().lstrip(":"):
-                    self.outputtype = oclass
-                    return True
+            oclass = ROUTES.get(RouteKind.OUTPUT, fargs[0].lstrip(":"))
+            if oclass is not None:
+                self.outputtype = oclass
+                return True
 
         return False
 
@@ -183,22 +375,19 @@ class BackendRequest(WebRequest):
             bool: Whether the command was successful
         """
 
-        for name, inst in SENSORS.items():
-            if name.lower() == fargs[0].lower():
-                inst.tpoll()
-                if inst.data is None:
-                    continue
+        inst = ROUTES.get(RouteKind.SENSOR, fargs[0])
+        if inst is None:
+            return False
 
-                out = self.outputtype(body)
-                inst.to(out, fargs[1:])
-                if type(self.response) == dict:
-                    self.response |= out.api_resp()
-                    self.headers |= out.api_headers()
-                    self.code = out.api_response(self.code)
+        inst.tpoll()
+        if inst.data is None:
+            return False
 
-                return True
+        out = self.outputtype(body)
+        inst.to(out, fargs[1:])
+        self._merge_output(out)
 
-        return False
+        return True
 
     def _execute_backend(self, fargs: list[str], body: dict) -> bool:
         """Tries to execute the requested backend function
@@ -211,21 +400,16 @@ class BackendRequest(WebRequest):
             bool: Whether the command was successful
         """
 
-        for name, fclass in BFUNC.items():
-            if name.lower() == fargs[0].lower():
-                self._check_permissions(50, fargs)
-
-                res = fclass(self, fargs[1:], body).api()
+        fclass = ROUTES.get(RouteKind.BFUNC, fargs[0])
+        if fclass is None:
+            return False
 
-                if isinstance(self.response, dict):
-                    if isinstance(res, dict):
-                        self.response |= res
-                    else:
-                        self.response = res
+        self._check_permissions(50, fargs)
 
-                return True
+        res = fclass(self, fargs[1:], body).api()
+        self._merge_result(res)
 
-        return False
+        return True
 
     def _execute_frontend(self, device: Device, fargs: list[str], body: dict) -> bool:
         """Tries to execute the frontend function on the connecting device
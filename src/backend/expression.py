@@ -0,0 +1,315 @@
+import ast
+import operator
+import re
+from typing import Any, Callable
+
+VARIABLE = re.compile(r"\$([A-Za-z_]\w*)")
+
+# String literals are matched first so `$` inside them is left alone
+_TOKENS = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|" + VARIABLE.pattern)
+_PREFIX = "_var_"
+
+_Eval = Callable[[dict[str, Any]], Any]
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+def _round(number: Any, ndigits: Any = None) -> Any:
+    # Large negative digits compute a power of ten as large as the digits first
+    if isinstance(ndigits, int) and abs(ndigits) > Expression.MAX_DIGITS:
+        raise ExpressionError("Digits to round to are out of range")
+    return round(number, ndigits)
+
+
+class Expression:
+    # Results of `**`, `*` and `round` are refused before they are computed if they would be larger
+    MAX_BITS = 10_000
+    MAX_REPEAT = 100_000
+    MAX_DIGITS = 1_000
+
+    BINARY: dict[type, Callable[[Any, Any], Any]] = {
+        ast.Add: operator.add,
+        ast.Sub: operator.sub,
+        ast.Mult: operator.mul,
+        ast.Div: operator.truediv,
+        ast.FloorDiv: operator.floordiv,
+        ast.Mod: operator.mod,
+        ast.Pow: operator.pow,
+    }
+    UNARY: dict[type, Callable[[Any], Any]] = {
+        ast.Not: operator.not_,
+        ast.USub: operator.neg,
+        ast.UAdd: operator.pos,
+    }
+    COMPARE: dict[type, Callable[[Any, Any], Any]] = {
+        ast.Eq: operator.eq,
+        ast.NotEq: operator.ne,
+        ast.Lt: operator.lt,
+        ast.LtE: operator.le,
+        ast.Gt: operator.gt,
+        ast.GtE: operator.ge,
+        ast.In: lambda a, b: a in b,
+        ast.NotIn: lambda a, b: a not in b,
+        ast.Is: operator.is_,
+        ast.IsNot: operator.is_not,
+    }
+    FUNCTIONS: dict[str, Callable[..., Any]] = {
+        "abs": abs,
+        "all": all,
+        "any": any,
+        "bool": bool,
+        "float": float,
+        "int": int,
+        "len": len,
+        "max": max,
+        "min": min,
+        "round": _round,
+        "str": str,
+        "sum": sum,
+    }
+
+    def __init__(self, source: str) -> None:
+        """An expression parsed and compiled once, then evaluated against `$variables`
+
+        Only literals, variables, arithmetic, comparisons, boolean logic, indexing
+        and calls to `Expression.FUNCTIONS` are allowed. Attribute access, imports
+        and everything else is rejected while compiling.
+
+        Args:
+            source (str): The expression, e.g. `not $ok and $temp > 20`
+
+        Raises:
+            ExpressionError: If the expression is malformed or not allowed
+        """
+
+        self.source = source
+        self.variables: set[str] = set()
+
+        translated = _TOKENS.sub(
+            lambda m: m.group(1) or f"{_PREFIX}{m.group(2)}", source.strip()
+        )
+        try:
+            tree = ast.parse(translated, mode="eval")
+        except SyntaxError as e:
+            raise ExpressionError(f"Malformed expression `{source}`: {e.msg}") from e
+
+        self._eval = self._compile(tree.body)
+
+    def __call__(self, variables: dict[str, Any]) -> Any:
+        """
+        Args:
+            variables (dict[str, Any]): The values of the variables by name, without the `$`
+
+        Raises:
+            ExpressionError: If a variable is missing or evaluating failed
+
+        Returns:
+            Any: The value of the expression
+        """
+
+        try:
+            return self._eval(variables)
+        except ExpressionError:
+            raise
+        except KeyError as e:
+            raise ExpressionError(f"Variable ${e.args[0]} is not declared") from e
+        except Exception as e:
+            raise ExpressionError(f"Evaluating `{self.source}` failed: {e}") from e
+
+    def __repr__(self) -> str:
+        return f"Expression({self.source!r})"
+
+    def _compile(self, node: ast.expr) -> _Eval:
+        """Turns an AST node into a closure evaluating it
+
+        Args:
+            node (ast.expr): The node to compile
+
+        Raises:
+            ExpressionError: If the node is not allowed
+
+        Returns:
+            _Eval: Closure taking the variables and returning the value of the node
+        """
+
+        match node:
+            case ast.Constant(value=value):
+                return lambda _: value
+
+            case ast.Name(id=name) if name.startswith(_PREFIX):
+                var = name[len(_PREFIX) :]
+                self.variables.add(var)
+                return lambda v: v[var]
+
+            case ast.BoolOp(op=op, values=values):
+                parts = [self._compile(n) for n in values]
+                if isinstance(op, ast.And):
+                    return lambda v: _all_and(parts, v)
+                return lambda v: _any_or(parts, v)
+
+            case ast.UnaryOp(op=op, operand=operand) if type(op) in Expression.UNARY:
+                func = Expression.UNARY[type(op)]
+                inner = self._compile(operand)
+                return lambda v: func(inner(v))
+
+            case ast.BinOp(op=op, left=left, right=right) if (
+                type(op) in Expression.BINARY
+            ):
+                return self._binary(op, self._compile(left), self._compile(right))
+
+            case ast.Compare(left=left, ops=ops, comparators=comparators) if all(
+                type(o) in Expression.COMPARE for o in ops
+            ):
+                first = self._compile(left)
+                chain = [
+                    (Expression.COMPARE[type(o)], self._compile(c))
+                    for o, c in zip(ops, comparators)
+                ]
+                if len(chain) == 1:
+                    func, right = chain[0]
+                    return lambda v: func(first(v), right(v))
+                return lambda v: _compare_chain(first, chain, v)
+
+            case ast.IfExp(test=test, body=body, orelse=orelse):
+                t, b, o = (
+                    self._compile(test),
+                    self._compile(body),
+                    self._compile(orelse),
+                )
+                return lambda v: b(v) if t(v) else o(v)
+
+            case ast.Subscript(value=value, slice=index) if not isinstance(
+                index, ast.Slice
+            ):
+                container, key = self._compile(value), self._compile(index)
+                return lambda v: container(v)[key(v)]
+
+            case ast.List(elts=elts) | ast.Tuple(elts=elts) | ast.Set(elts=elts):
+                items = [self._compile(n) for n in elts]
+                kind = {ast.List: list, ast.Tuple: tuple, ast.Set: set}[type(node)]
+                return lambda v: kind(i(v) for i in items)
+
+            case ast.Call(func=ast.Name(id=name), args=args, keywords=[]) if (
+                name in Expression.FUNCTIONS
+            ):
+                func = Expression.FUNCTIONS[name]
+                params = [self._compile(a) for a in args]
+                return lambda v: func(*(p(v) for p in params))
+
+        raise ExpressionError(
+            f"`{ast.unparse(node).replace(_PREFIX, '$')}` is not allowed in `{self.source}`"
+        )
+
+    def _binary(self, op: ast.operator, left: _Eval, right: _Eval) -> _Eval:
+        """
+        Args:
+            op (ast.operator): The operator
+            left (_Eval): Closure of the left operand
+            right (_Eval): Closure of the right operand
+
+        Returns:
+            _Eval: Closure applying the operator, guarding against huge results
+        """
+
+        func = Expression.BINARY[type(op)]
+
+        if isinstance(op, ast.Pow):
+
+            def power(v: dict[str, Any]) -> Any:
+                base, exp = left(v), right(v)
+                # Float powers overflow right away, only integers grow without limit
+                if isinstance(base, int) and isinstance(exp, int) and exp > 0:
+                    if base.bit_length() * exp > Expression.MAX_BITS:
+                        raise ExpressionError("Result of the power is too large")
+                return func(base, exp)
+
+            return power
+
+        if isinstance(op, ast.Mult):
+
+            def multiply(v: dict[str, Any]) -> Any:
+                a, b = left(v), right(v)
+                if isinstance(a, int) and isinstance(b, int):
+                    if a.bit_length() + b.bit_length() > Expression.MAX_BITS:
+                        raise ExpressionError("Result of the product is too large")
+
+                for seq, n in ((a, b), (b, a)):
+                    if isinstance(
+                        seq, (str, bytes, bytearray, list, tuple)
+                    ) and isinstance(n, int):
+                        if len(seq) * n > Expression.MAX_REPEAT:
+                            raise ExpressionError("Repeated sequence is too long")
+                return func(a, b)
+
+            return multiply
+
+        if isinstance(op, ast.Mod):
+
+            def modulo(v: dict[str, Any]) -> Any:
+                a, b = left(v), right(v)
+                # Formatting widths like `%0200000000d` allocate before anything could be checked
+                if isinstance(a, (str, bytes, bytearray)):
+                    raise ExpressionError("String formatting is not allowed")
+                return func(a, b)
+
+            return modulo
+
+        return lambda v: func(left(v), right(v))
+
+
+def _all_and(parts: list[_Eval], v: dict[str, Any]) -> Any:
+    result = True
+    for p in parts:
+        result = p(v)
+        if not result:
+            return result
+    return result
+
+
+def _any_or(parts: list[_Eval], v: dict[str, Any]) -> Any:
+    result = False
+    for p in parts:
+        result = p(v)
+        if result:
+            return result
+    return result
+
+
+def _compare_chain(
+    first: _Eval,
+    chain: list[tuple[Callable[[Any, Any], Any], _Eval]],
+    v: dict[str, Any],
+) -> bool:
+    left = first(v)
+    for func, right in chain:
+        value = right(v)
+        if not func(left, value):
+            return False
+        left = value
+    return True
+
+
+def substitute(template: Any, variables: dict[str, Any]) -> Any:
+    """Replaces the `$variables` in a string of an automation body
+
+    A string consisting of a single variable is replaced by its value as is,
+    keeping its type. Values of other types are returned unchanged.
+
+    Args:
+        template (Any): The value from the body
+        variables (dict[str, Any]): The values of the variables by name, without the `$`
+
+    Returns:
+        Any: The value with its variables replaced
+    """
+
+    if not isinstance(template, str):
+        return template
+
+    whole = VARIABLE.fullmatch(template)
+    if whole is not None and whole.group(1) in variables:
+        return variables[whole.group(1)]
+
+    return VARIABLE.sub(lambda m: str(variables.get(m.group(1), m.group(0))), template)
@@ -1,49 +1,181 @@
+from enum import Enum
+import heapq
+import itertools
+import threading
 import time
 from typing import Callable
-from threading import Thread
 
-from log import logged_thread
+import config
+from log import LOG, logged_thread
+from proj_types.worker_pool import WorkerPool
+
+
+class Overrun(Enum):
+    SKIP = 0  # Runs falling due while the previous one is running are dropped
+    COALESCE = 1  # They are merged into a single run after the current one
+    QUEUE = 2  # Every one of them runs, one after another
 
 
 class Schedule:
-    _schedules: list["Schedule"] = []
-    _last_tick = 0
-    SLEEP_TIME = 0.2
+    WORKERS = 4
+    QUEUE_SIZE = 64
+
+    _heap: list[tuple[float, int, "Schedule"]] = []
+    _counter = itertools.count()
+    _cond = threading.Condition()
+    _pool: WorkerPool | None = None
 
     @staticmethod
     def add_schedule(schedule: "Schedule") -> None:
-        Schedule._schedules.append(schedule)
+        with Schedule._cond:
+            schedule._active = True
+            if schedule._interval is None:
+                return
+
+            schedule._deadline = time.monotonic() + schedule._first
+            Schedule._push(schedule)
+            Schedule._cond.notify()
 
     @staticmethod
     def remove_schedule(schedule: "Schedule") -> None:
-        Schedule._schedules.remove(schedule)
+        with Schedule._cond:
+            # The heap entry is dropped once it comes up
+            schedule._active = False
+            schedule._pending = 0
+
+    @staticmethod
+    def trigger(schedule: "Schedule") -> None:
+        """Runs an added schedule now, outside of its interval, applying its overrun policy
+
+        Args:
+            schedule (Schedule): The schedule to run
+        """
+
+        with Schedule._cond:
+            if not schedule._active:
+                return
+            run = schedule._due()
+
+        if run:
+            schedule._dispatch()
 
     @staticmethod
     def start_scheduler() -> None:
+        Schedule._pool = WorkerPool(
+            "Schedule",
+            int(config.load_var("scheduler.workers", Schedule.WORKERS)),
+            int(config.load_var("scheduler.queue_size", Schedule.QUEUE_SIZE)),
+        )
         logged_thread(
-            target=Schedule._tick_all, name="Intervalometer", daemon=True
+            target=Schedule._run_all, name="Intervalometer", daemon=True
         ).start()
 
     @staticmethod
-    def _tick_all() -> None:
+    def _push(schedule: "Schedule") -> None:
+        schedule._version = next(Schedule._counter)
+        heapq.heappush(
+            Schedule._heap, (schedule._deadline, schedule._version, schedule)
+        )
+
+    @staticmethod
+    def _run_all() -> None:
+        """Sleeps until the next deadline and hands every due schedule to the worker pool"""
+
         while True:
-            t = time.time()
-            dt = t - Schedule._last_tick
-            Schedule._last_tick = t
-            for s in Schedule._schedules:
-                s.tick(dt)
+            with Schedule._cond:
+                while True:
+                    now = time.monotonic()
+                    if len(Schedule._heap) > 0 and Schedule._heap[0][0] <= now:
+                        break
+
+                    timeout = Schedule._heap[0][0] - now if Schedule._heap else None
+                    Schedule._cond.wait(timeout)
 
-            time.sleep(Schedule.SLEEP_TIME)
+                _, version, schedule = heapq.heappop(Schedule._heap)
+                if not schedule._active or version != schedule._version:
+                    continue
 
-    def __init__(self, interval: float, executor: Callable[[], None]) -> None:
-        self._interval = interval
+                # Deadlines advance by whole intervals, late wakeups do not add up
+                # Only schedules with an interval are ever pushed
+                interval: float = schedule._interval  # type: ignore
+                missed = int((now - schedule._deadline) // interval)
+                schedule._deadline += (missed + 1) * interval
+                Schedule._push(schedule)
+
+                run = schedule._due()
+
+            if run:
+                schedule._dispatch()
+
+    def __init__(
+        self,
+        interval: float | None,
+        executor: Callable[[], None],
+        overrun: Overrun = Overrun.SKIP,
+        first: float | None = None,
+    ) -> None:
+        """A function executed regularly on the scheduler's worker pool
+
+        Args:
+            interval (float | None): Seconds between two runs, `None` to only run when triggered
+            executor (Callable[[], None]): The function to execute
+            overrun (Overrun, optional): What happens to runs falling due while the previous one is still running. Defaults to Overrun.SKIP.
+            first (float | None, optional): Seconds until the first run. Defaults to the interval.
+        """
+
+        self._interval = None if interval is None else max(interval, 0.001)
         self._executor = executor
-        self._passed_time: float = 0
+        self._overrun = overrun
+        self._first = (self._interval or 0.0) if first is None else first
+
+        self._active = False
+        self._deadline = 0.0
+        self._version = -1
+
+        self._running = False
+        self._pending = 0
 
-    def tick(self, t: float) -> None:
-        self._passed_time += t
+    def _due(self) -> bool:
+        """Applies the overrun policy once the schedule falls due, called with the lock held
 
-        if self._passed_time > self._interval:
-            self._passed_time %= self._interval
+        Returns:
+            bool: Whether a run is to be dispatched now
+        """
 
+        if not self._running:
+            self._running = True
+            return True
+
+        if self._overrun == Overrun.COALESCE:
+            self._pending = 1
+        elif self._overrun == Overrun.QUEUE:
+            self._pending += 1
+        else:
+            LOG.debug("Skipping run of %s, the previous one is still running", self)
+
+        return False
+
+    def _dispatch(self) -> None:
+        pool = Schedule._pool
+        if pool is None or not pool.submit(self._execute):
+            with Schedule._cond:
+                self._running = False
+
+    def _execute(self) -> None:
+        try:
             self._executor()
+        finally:
+            with Schedule._cond:
+                again = self._active and self._pending > 0
+                if again:
+                    self._pending -= 1
+                else:
+                    self._running = False
+
+            if again:
+                self._dispatch()
+
+    def __repr__(self) -> str:
+        name = getattr(self._executor, "__qualname__", repr(self._executor))
+        every = "triggered" if self._interval is None else f"{self._interval}s"
+        return f"Schedule({name}, {every})"
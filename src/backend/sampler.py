@@ -0,0 +1,228 @@
+import threading
+import time
+from typing import Any
+
+import numpy as np
+
+from backend.interval import Overrun, Schedule
+from backend.sensor import SENSORS, Sensor
+import config
+from log import LOG
+from utils import CleanUp
+
+
+class History:
+    def __init__(self, capacity: int) -> None:
+        """Ring buffer of the samples of one sensor field
+
+        Args:
+            capacity (int): Amount of samples after which the oldest are overwritten
+        """
+
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, t: float, value: float) -> None:
+        """
+        Args:
+            t (float): Unix time of the sample
+            value (float): The sampled value
+        """
+
+        self._times[self._next] = t
+        self._values[self._next] = value
+        self._next = (self._next + 1) % len(self._times)
+        self._count = min(self._count + 1, len(self._times))
+
+    def window(self, since: float, until: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Args:
+            since (float): Unix time of the first sample to include
+            until (float): Unix time of the last sample to include
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Times and values of the samples in the window, oldest first
+        """
+
+        start = (self._next - self._count) % len(self._times)
+        order = (start + np.arange(self._count)) % len(self._times)
+        times = self._times[order]
+        values = self._values[order]
+
+        # Samples are appended in time order, so the window is one slice
+        lo = np.searchsorted(times, since, side="left")
+        hi = np.searchsorted(times, until, side="right")
+        return times[lo:hi], values[lo:hi]
+
+    def downsample(
+        self, since: float, until: float, points: int
+    ) -> list[tuple[float, float]]:
+        """Averages the samples of a window into at most `points` buckets of equal duration
+
+        Args:
+            since (float): Unix time of the first sample to include
+            until (float): Unix time of the last sample to include
+            points (int): Maximum amount of points returned
+
+        Returns:
+            list[tuple[float, float]]: Mean time and mean value of every non-empty bucket
+        """
+
+        times, values = self.window(since, until)
+        if len(times) <= points:
+            return list(zip(times.tolist(), values.tolist()))
+
+        edges = np.linspace(times[0], times[-1], points + 1)
+        buckets = np.clip(
+            np.searchsorted(edges, times, side="right") - 1, 0, points - 1
+        )
+
+        counts = np.bincount(buckets, minlength=points)
+        t_sum = np.bincount(buckets, weights=times, minlength=points)
+        v_sum = np.bincount(buckets, weights=values, minlength=points)
+
+        filled = counts > 0
+        return list(
+            zip(
+                (t_sum[filled] / counts[filled]).tolist(),
+                (v_sum[filled] / counts[filled]).tolist(),
+            )
+        )
+
+
+class Sampler(CleanUp):
+    CAPACITY = 2880
+
+    def __init__(self, sensors: dict[str, Sensor]) -> None:
+        """Samples every sensor declaring a `SAMPLE_INTERVAL` and keeps the history of its numeric fields
+
+        Args:
+            sensors (dict[str, Sensor]): The sensors by name
+        """
+
+        self._sensors = sensors
+        self._capacity = int(config.load_var("sampler.capacity", Sampler.CAPACITY))
+        self._lock = threading.Lock()
+        self._schedules: list[Schedule] = []
+
+        self._history: dict[str, dict[str, History]] = {}
+        self._recorded: dict[str, float] = {}
+
+    def start(self) -> None:
+        """Adds a schedule for every sensor declaring a `SAMPLE_INTERVAL`"""
+
+        for name, sensor in self._sensors.items():
+            if not sensor.SAMPLE_INTERVAL:
+                continue
+
+            schedule = Schedule(
+                sensor.SAMPLE_INTERVAL,
+                lambda name=name: self.sample(name),
+                Overrun.SKIP,
+                first=0,
+            )
+            self._schedules.append(schedule)
+            Schedule.add_schedule(schedule)
+
+        if len(self._schedules) > 0:
+            LOG.info("Sampling %d sensors", len(self._schedules))
+
+    def cleanup(self) -> None:
+        for schedule in self._schedules:
+            Schedule.remove_schedule(schedule)
+        self._schedules.clear()
+
+    def sample(self, name: str) -> None:
+        """Polls a sensor and records its data
+
+        Args:
+            name (str): The name of the sensor
+        """
+
+        sensor = self._sensors[name]
+        try:
+            sensor.tpoll()
+        except Exception:
+            LOG.exception("Sampling %s failed", name)
+            return
+
+        self.record(name, sensor)
+
+    def record(self, name: str, sensor: Sensor) -> None:
+        """Adds the current data of a sensor to its history, once per poll
+
+        Args:
+            name (str): The name of the sensor
+            sensor (Sensor): The sensor
+        """
+
+        data = sensor.data
+        polled_at = sensor.polled_at
+        if data is None or polled_at <= self._recorded.get(name, 0.0):
+            return
+
+        with self._lock:
+            self._recorded[name] = polled_at
+            fields = self._history.setdefault(name.lower(), {})
+
+            for k, v in data.items():
+                # Only numbers make up a series, flags and text are left out
+                if isinstance(v, bool) or not isinstance(v, (int, float)):
+                    continue
+
+                if k not in fields:
+                    fields[k] = History(self._capacity)
+                fields[k].append(polled_at, float(v))
+
+    def query(
+        self,
+        name: str,
+        field: str | None = None,
+        since: float = 0.0,
+        until: float | None = None,
+        points: int = 100,
+    ) -> dict[str, list[tuple[float, float]]] | None:
+        """Reads the history of a sensor without polling it
+
+        Args:
+            name (str): The name of the sensor, case-insensitive
+            field (str | None, optional): A single field to read. Defaults to None.
+            since (float, optional): Unix time of the first sample. Defaults to 0.0.
+            until (float | None, optional): Unix time of the last sample. Defaults to now.
+            points (int, optional): Maximum amount of points per field. Defaults to 100.
+
+        Returns:
+            dict[str, list[tuple[float, float]]] | None: `(time, value)` points by field or `None` if the sensor has no history
+        """
+
+        until = time.time() if until is None else until
+
+        with self._lock:
+            fields = self._history.get(name.lower())
+            if fields is None:
+                return None
+
+            return {
+                k: h.downsample(since, until, max(1, points))
+                for k, h in fields.items()
+                if field is None or k == field
+            }
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Returns:
+            dict[str, Any]: Amount of samples kept per sensor field
+        """
+
+        with self._lock:
+            return {
+                n: {k: len(h) for k, h in f.items()} for n, f in self._history.items()
+            }
+
+
+SAMPLER = Sampler(SENSORS)
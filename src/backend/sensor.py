@@ -1,39 +1,180 @@
 from abc import ABC, abstractmethod
 import logging
 import os
+import threading
 import time
 import traceback
-from typing import Any, Type
+from typing import Any, Callable, Type
 from backend.output import OutputDevice
+import config
 from device.pluginloader import load_plugins
 from locations import PL_SENSOR
 
-from log import LOG
+from log import LOG, logged_thread
 
 
 class Sensor(ABC):
-    polling = False
-    _last_poll = 0
+    MAX_STALE = 60.0
+    TTL = 600.0
+
+    # Seconds between samples kept as history, `None` to only poll on demand
+    SAMPLE_INTERVAL: float | None = None
+
+    def __init__(
+        self,
+        repoll_after: float = 5,
+        max_stale: float | None = None,
+        ttl: float | None = None,
+    ) -> None:
+        """
+        Args:
+            repoll_after (float, optional): Seconds after which the data is refreshed. Defaults to 5.
+            max_stale (float | None, optional): Seconds up to which old data is returned while it is refreshed in the background. Defaults to `sensors.max_stale`.
+            ttl (float | None, optional): Seconds after which data is dropped if refreshing keeps failing. Defaults to `sensors.ttl`.
+        """
 
-    def __init__(self, repoll_after: float = 5) -> None:
         self.data: dict[str, Any] | None = None
         self._repoll_after = repoll_after
+        self._max_stale = max(
+            repoll_after,
+            max_stale or float(config.load_var("sensors.max_stale", Sensor.MAX_STALE)),
+        )
+        self._ttl = max(
+            self._max_stale, ttl or float(config.load_var("sensors.ttl", Sensor.TTL))
+        )
+
+        self._cond = threading.Condition()
+        self._polling = False
+        self._last_poll = 0.0
+
+        # Unix time of the last successful poll
+        self.polled_at = 0.0
+
+        self._listeners: list[Callable[[set[str]], None]] = []
+
+    def subscribe(self, callback: Callable[[set[str]], None]) -> None:
+        """Registers a callback for changes of the data
+
+        Args:
+            callback (Callable[[set[str]], None]): Called with the names of the changed fields after a poll changed the data
+        """
+
+        with self._cond:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[set[str]], None]) -> None:
+        """Removes a callback registered with `subscribe`
+
+        Args:
+            callback (Callable[[set[str]], None]): The registered callback
+        """
+
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    @property
+    def polling(self) -> bool:
+        return self._polling
 
     def tpoll(self) -> None:
-        """Polls the data using the interval set by the sensor"""
-
-        if not self.polling:
-            LOG.debug("Starting poll")
-            self.polling = True
-            if time.time() > self._last_poll + self._repoll_after:
-                LOG.debug("Poll vars")
-                self.poll()
-                self._last_poll = time.time()
-            self.polling = False
-        else:
-            LOG.debug("Falling into wait loop")
-            while self.polling:
-                time.sleep(0.1)
+        """Makes sure the data is recent enough, refreshing it in the background where possible
+
+        Notes:
+            Data younger than `repoll_after` is returned as is. Data younger than
+            `max_stale` is returned right away while a refresh runs in the background.
+            Older or missing data makes the caller wait for the refresh.
+        """
+
+        with self._cond:
+            age = time.monotonic() - self._last_poll
+            if self.data is not None and age <= self._repoll_after:
+                return
+
+            usable = self.data is not None and age <= self._max_stale
+
+            if not self._polling:
+                self._polling = True
+                if usable:
+                    LOG.debug("Refreshing %s in the background", type(self).__name__)
+                    logged_thread(
+                        name=f"Poll {type(self).__name__}",
+                        target=self._refresh,
+                        args=(False,),
+                    ).start()
+                    return
+            elif usable:
+                return
+            else:
+                LOG.debug("Waiting for poll of %s", type(self).__name__)
+                self._cond.wait_for(lambda: not self._polling)
+                return
+
+        self._refresh(True)
+
+    def _refresh(self, raise_errors: bool) -> None:
+        """Polls the sensor, wakes everyone waiting for the data and publishes what changed
+
+        Args:
+            raise_errors (bool): Whether exceptions of the poll are raised to the caller or only logged
+        """
+
+        before = None if self.data is None else dict(self.data)
+        listeners: list[Callable[[set[str]], None]] = []
+
+        try:
+            self.poll()
+            with self._cond:
+                self._last_poll = time.monotonic()
+                self.polled_at = time.time()
+                listeners = list(self._listeners)
+
+        except Exception:
+            with self._cond:
+                if time.monotonic() - self._last_poll > self._ttl:
+                    self.data = None
+
+            if raise_errors:
+                raise
+            LOG.exception("Background poll of %s failed", type(self).__name__)
+
+        finally:
+            with self._cond:
+                self._polling = False
+                self._cond.notify_all()
+
+        self._publish(before, listeners)
+
+    def _publish(
+        self,
+        before: dict[str, Any] | None,
+        listeners: list[Callable[[set[str]], None]],
+    ) -> None:
+        """Notifies the listeners of the fields a poll changed
+
+        Args:
+            before (dict[str, Any] | None): The data before the poll
+            listeners (list[Callable[[set[str]], None]]): The callbacks to notify
+        """
+
+        if len(listeners) == 0:
+            return
+
+        before = before or {}
+        after = self.data or {}
+        changed = {
+            k
+            for k in before.keys() | after.keys()
+            if k not in before or k not in after or before[k] != after[k]
+        }
+        if len(changed) == 0:
+            return
+
+        for callback in listeners:
+            try:
+                callback(changed)
+            except Exception:
+                LOG.exception("Exception notifying %s subscriber", type(self).__name__)
 
     @abstractmethod
     def poll(self) -> None:
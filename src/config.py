@@ -1,17 +1,103 @@
+import copy
 import json
 import logging
 import os
-from typing import Any
+import threading
+import time
+from typing import Any, Callable
 from locations import ROOT
 
 from log import LOG
 
+CONFIG_PATH = os.path.join(ROOT, "config.json")
+
+# Seconds between checks whether the file was changed on disk
+CHECK_INTERVAL = 1.0
+
+_lock = threading.RLock()
+_data: dict = {}
+_stamp: tuple[int, int] | None = None
+_checked = 0.0
+_paths: dict[str, list[str]] = {}
+_subscribers: list[Callable[[str], None]] = []
+
+# Tells a missing `default` of `load_var` apart from `None`
+_MISSING = object()
+
 
 def __load_json(path: str) -> dict:
-    with open(os.path.join(ROOT, "config.json"), "r") as rf:
+    with open(path, "r") as rf:
         return json.loads(rf.read())
 
 
+def _current() -> dict:
+    """Gets the parsed config, parsing the file again only once it changed
+
+    Returns:
+        dict: The root node of the config file
+    """
+
+    global _data, _stamp, _checked
+
+    now = time.monotonic()
+    if _stamp is not None and now - _checked < CHECK_INTERVAL:
+        return _data
+
+    changed = False
+    with _lock:
+        st = os.stat(CONFIG_PATH)
+        stamp = (st.st_mtime_ns, st.st_size)
+
+        if stamp != _stamp:
+            changed = _stamp is not None
+            _data = __load_json(CONFIG_PATH)
+            _stamp = stamp
+        _checked = now
+        data = _data
+
+    if changed:
+        _notify("")
+    return data
+
+
+def _split(path: str) -> list[str]:
+    keys = _paths.get(path)
+    if keys is None:
+        keys = _paths[path] = path.split(".")
+    return keys
+
+
+def _notify(path: str) -> None:
+    for callback in list(_subscribers):
+        try:
+            callback(path)
+        except Exception:
+            LOG.exception("Exception notifying config subscriber")
+
+
+def subscribe(callback: Callable[[str], None]) -> None:
+    """Registers a callback for changes of the config
+
+    Args:
+        callback (Callable[[str], None]): Called with the path set by `set_var` or an empty string if the file was changed on disk
+    """
+
+    with _lock:
+        _subscribers.append(callback)
+
+
+def unsubscribe(callback: Callable[[str], None]) -> None:
+    """Removes a callback registered with `subscribe`
+
+    Args:
+        callback (Callable[[str], None]): The registered callback
+    """
+
+    with _lock:
+        if callback in _subscribers:
+            _subscribers.remove(callback)
+
+
 def load_envvars() -> None:
     """Loads all specified EnvVars from the config file"""
 
@@ -23,25 +109,35 @@ def load_envvars() -> None:
         os.environ[k] = i
 
 
-def load_var(path: str) -> Any | None:
+def load_var(path: str, default: Any = _MISSING) -> Any | None:
     """Loads the variable located at the `path`
 
     Args:
         path (str): The path of the variable to load
+        default (Any, optional): Returned without logging if the path is missing, for optional variables
 
     Returns:
-        Any | None: The variable located at the `path` or none if the path is invalid
+        Any | None: The variable located at the `path` or `default`, none if the path is invalid and no default was given
     """
 
     try:
-        data = __load_json(os.path.join(ROOT, "config.json"))
+        data = _current()
 
-        for p in path.split("."):
+        for p in _split(path):
             data = data[p]
-    except Exception:
+    except (KeyError, TypeError):
+        if default is not _MISSING:
+            return default
+
         LOG.exception("Exception loading `%s` from config", path)
         return None
+    except Exception:
+        LOG.exception("Exception loading `%s` from config", path)
+        return None if default is _MISSING else default
 
+    # Callers may change what they get without changing the cache
+    if isinstance(data, (dict, list)):
+        return copy.deepcopy(data)
     return data
 
 
@@ -56,19 +152,33 @@ def set_var(path: str, value: Any) -> None:
         Still untested because I dont fucking know what this will result in ._.
     """
 
-    cpath = os.path.join(ROOT, "config.json")
-    data = __load_json(cpath)
+    global _data, _stamp, _checked
+
+    with _lock:
+        # Always start from the file, it might have been changed by hand
+        _checked = 0.0
+        data = copy.deepcopy(_current())
+
+        data_part = data
+        path_part = _split(path)
+
+        for k in range(len(path_part) - 1):
+            data_part = data_part[path_part[k]]
 
-    data_part = data
-    path_part = path.split(".")
+        data_part[path_part[-1]] = copy.deepcopy(value)
 
-    for k in range(len(path_part) - 1):
-        data_part = data_part[path_part[k]]
+        # Readers of the file never see it half written
+        tmp = f"{CONFIG_PATH}.tmp"
+        with open(tmp, "w") as wf:
+            wf.write(json.dumps(data, indent=2))
+        os.replace(tmp, CONFIG_PATH)
 
-    data_part[path_part[-1]] = value
+        st = os.stat(CONFIG_PATH)
+        _data = data
+        _stamp = (st.st_mtime_ns, st.st_size)
+        _checked = time.monotonic()
 
-    with open(cpath, "w") as wf:
-        wf.write(json.dumps(data, indent=2))
+    _notify(path)
 
 
 def load_full() -> dict:
@@ -78,4 +188,4 @@ def load_full() -> dict:
         dict[Any, Any]: The root node of the config file
     """
 
-    return __load_json(os.path.join(ROOT, "config.json"))
+    return copy.deepcopy(_current())
@@ -11,6 +11,9 @@ from log import LOG
 
 
 class APIFunct(ABC):
+    # Read-only functions may run concurrently with other segments of a path
+    SAFE = False
+
     def __init__(
         self, request: WebRequest | None, args: list[str], body: dict[str, Any]
     ) -> None:
@@ -3,6 +3,7 @@ import gzip
 from io import BytesIO
 import json
 import logging
+import os
 import traceback
 from typing import Any, NoReturn
 from cryptography.hazmat.primitives import serialization, hashes
@@ -18,6 +19,7 @@ from locations import VERSION
 import locations
 from utils import CaseInsensitiveDict, CleanUp, dumpb, get_os_name
 from webclient.client_request import WebClient, WebMethod
+from webclient.connection_pool import ConnectionPool
 from webserver.webrequest import WebResponse
 
 from typing import TYPE_CHECKING
@@ -85,6 +87,7 @@ class Device:
         self._subdevices: list[SubDevice] = []
         self._os: str = ""
         self._version: float = 0.0
+        self._pool = ConnectionPool()
 
         container[ip] = self
 
@@ -224,6 +227,7 @@ class Device:
             .set_method(WebMethod.POST)
             .set_path(f"/{".".join(fargs)}")
             .set_secure(True)
+            .set_pool(self._pool)
             .set_json(body)
             .send()
         )
@@ -238,6 +242,7 @@ class Device:
     def close(self) -> None:
         """Sends a close request to the frontend device"""
 
+        self._pool.clear()
         WebClient(self._ip, DEV_PORT).set_path("/close").set_secure(True).set_timeout(
             0.1
         ).send()
@@ -253,9 +258,12 @@ class Device:
 
 
 class FrontendDevice(CleanUp):
+    UPDATE_ATTEMPTS = 3
+
     def __init__(self, ip: str) -> None:
         self._token: str | None = None
         self._ip: str = ip
+        self._pool = ConnectionPool()
 
     def login(self, version: float) -> None | NoReturn:
         """Sends a login request to the backend device
@@ -276,6 +284,7 @@ class FrontendDevice(CleanUp):
             .set_method(WebMethod.POST)
             .set_path("/login")
             .set_secure(True)
+            .set_pool(self._pool)
             .set_json(
                 {
                     "funcs": funcs,
@@ -299,22 +308,69 @@ class FrontendDevice(CleanUp):
         """Downloads the latest packed sources and updates"""
 
         LOG.info("Starting update")
-        dl = WebClient(self._ip, DEV_PORT).set_path("/pack.zip").send()
-
-        if dl.code != 200:
-            LOG.warning(
-                f"Update failed because of content download response {dl.code}: {dl.msg}"
-            )
+        part = os.path.join(locations.ROOT, "pack.zip.part")
+
+        for _ in range(FrontendDevice.UPDATE_ATTEMPTS):
+            try:
+                if self._download(part):
+                    break
+            except OSError:
+                LOG.warning("Update download interrupted, resuming", exc_info=True)
+        else:
+            LOG.warning("Update failed because the download did not complete")
             return
 
-        zbinary = BytesIO(dl.body)
-        locations.unpack(zbinary)
+        locations.unpack(part)
+        os.remove(part)
+        os.remove(f"{part}.etag")
 
         LOG.info("Finished update, restarting...")
         from main import restart
 
         restart()
 
+    def _download(self, part: str) -> bool:
+        """Downloads the packed sources to a file, continuing a download interrupted earlier
+
+        Args:
+            part (str): The path of the file to download to
+
+        Returns:
+            bool: Whether the file is complete
+        """
+
+        # The ETag makes sure we only continue downloading the same version
+        etag_file = f"{part}.etag"
+        have = os.path.getsize(part) if os.path.isfile(part) else 0
+        client = WebClient(self._ip, DEV_PORT).set_path("/pack.zip")
+
+        if have > 0 and os.path.isfile(etag_file):
+            with open(etag_file, "r") as rf:
+                client.add_header("Range", f"bytes={have}-")
+                client.add_header("If-Range", rf.read().strip())
+
+        dl = client.send(stream=True)
+
+        if dl.code == 416 and dl.get_header("Content-Range") == f"bytes */{have}":
+            # Nothing left to download
+            dl.read_into(BytesIO())
+            return True
+
+        if dl.code not in (200, 206):
+            LOG.warning(f"Update download failed with response {dl.code}: {dl.msg}")
+            dl.read_into(BytesIO())
+            if os.path.isfile(part):
+                os.remove(part)
+            return False
+
+        with open(etag_file, "w") as wf:
+            wf.write(dl.get_header("ETag") or "")
+
+        # A 200 means the server sent the whole file, e.g. because a new version was packed
+        with open(part, "ab" if dl.code == 206 else "wb") as wf:
+            dl.read_into(wf)
+        return True
+
     def _action_client(self, actions: str) -> WebClient:
         """Generates a WebClient to perform these actions
 
@@ -326,6 +382,7 @@ class FrontendDevice(CleanUp):
             WebClient(self._ip, DEV_PORT)
             .set_path(actions)
             .set_secure(True)
+            .set_pool(self._pool)
             .authorize(self._token)
         )
 
@@ -333,3 +390,4 @@ class FrontendDevice(CleanUp):
         resp = self._action_client("/logout").send()
         if resp.code != 200:
             LOG.warning("Logout did not succeed!")
+        self._pool.clear()
@@ -0,0 +1,74 @@
+from enum import Enum
+from typing import Any
+
+
+class RouteKind(Enum):
+    OUTPUT = 0
+    SENSOR = 1
+    BFUNC = 2
+    FFUNC = 3
+
+
+class RouteTable:
+    def __init__(self) -> None:
+        """Case-insensitive lookup of the plugins a path segment can address"""
+
+        self._sources: list[tuple[RouteKind, dict[str, Any]]] = []
+        self._routes: dict[str, list[tuple[RouteKind, Any]]] = {}
+
+    def register(self, kind: RouteKind, plugins: dict[str, Any]) -> "RouteTable":
+        """Adds the plugins of a kind to the table
+
+        Args:
+            kind (RouteKind): The kind of the plugins
+            plugins (dict[str, Any]): The plugin classes or instances by name, kept to rebuild the table from
+
+        Returns:
+            RouteTable: This table
+        """
+
+        self._sources.append((kind, plugins))
+        self.rebuild()
+        return self
+
+    def rebuild(self) -> None:
+        """Builds the table again, to be called after plugins were (re)loaded"""
+
+        routes: dict[str, list[tuple[RouteKind, Any]]] = {}
+
+        for kind, plugins in self._sources:
+            for name, handler in plugins.items():
+                entries = routes.setdefault(name.lower(), [])
+
+                # The first plugin of a kind wins, as with scanning the plugins in order
+                if all(k != kind for k, _ in entries):
+                    entries.append((kind, handler))
+
+        self._routes = routes
+
+    def resolve(self, segment: str) -> list[tuple[RouteKind, Any]]:
+        """
+        Args:
+            segment (str): The name of a path segment
+
+        Returns:
+            list[tuple[RouteKind, Any]]: All plugins with this name, in the order their kinds were registered
+        """
+
+        return self._routes.get(segment.lower(), [])
+
+    def get(self, kind: RouteKind, segment: str) -> Any | None:
+        """
+        Args:
+            kind (RouteKind): The kind of plugin to look for
+            segment (str): The name of a path segment
+
+        Returns:
+            Any | None: The plugin of this kind with this name or `None` if there is none
+        """
+
+        for k, handler in self._routes.get(segment.lower(), ()):
+            if k == kind:
+                return handler
+
+        return None
@@ -35,6 +35,32 @@ class DHAlgorithm:
 
         return self._make_crypt_str(b"IVS", length)
 
+    def make_stream_ivs(self, length: int) -> tuple[bytes, bytes]:
+        """Makes one IV string per direction, so both sides never share a key stream
+
+        Args:
+            length (int): The length of IV required
+
+        Returns:
+            tuple[bytes, bytes]: The IV for client to server and the IV for server to client
+        """
+
+        return self._make_crypt_str(b"C2S", length), self._make_crypt_str(
+            b"S2C", length
+        )
+
+    def make_session_secret(self, length: int = 32) -> bytes:
+        """Makes the secret later connections of this session derive their keys from
+
+        Args:
+            length (int, optional): The length of secret required. Defaults to 32.
+
+        Returns:
+            bytes: The generated secret
+        """
+
+        return self._make_crypt_str(b"SES", length)
+
     def _make_crypt_str(self, id: bytes, length: int) -> bytes:
         """Makes a crypto key using the exchanged `K` using the id and length
 
@@ -1,13 +1,25 @@
 import os
 import socket
+from typing import BinaryIO
 
 from encryption.encryption import Encryption, NoEncryption
 
 
 class EncryptedSocket:
+    RECV_CHUNK = 8192
+    SEND_CHUNK = 65536
+    MAX_LINE = 65536
+
     def __init__(self, sock: socket.socket) -> None:
         self._socket = sock
-        self._recv_buff = b""
+
+        # Receive buffer layout:
+        # [_start, _end) decrypted and unread, [_end, _raw_end) raw bytes of an incomplete block
+        self._recv_buff = bytearray(EncryptedSocket.RECV_CHUNK)
+        self._start = 0
+        self._end = 0
+        self._raw_end = 0
+
         self._send_buff = b""
         self._encryption: Encryption = NoEncryption()
 
@@ -18,7 +30,12 @@ class EncryptedSocket:
             encryption (Encryption): The new encryption to use from now on
         """
 
+        if isinstance(self._encryption, NoEncryption):
+            # Anything read ahead is still raw and belongs to the new encryption
+            self._end = self._start
+
         self._encryption = encryption
+        self._decrypt_pending()
 
     def block_size(self) -> int:
         """
@@ -28,6 +45,119 @@ class EncryptedSocket:
 
         return self._encryption.block_size()
 
+    def _reserve(self, size: int) -> None:
+        """Makes room for at least `size` bytes behind the buffered data
+
+        Args:
+            size (int): Amount of bytes needed
+
+        Notes:
+            The buffered data is moved to the front of the buffer, or into a new one if it
+            does not fit. Either way views handed out by `recv_view` are no longer valid.
+        """
+
+        if self._raw_end + size <= len(self._recv_buff):
+            return
+
+        used = self._raw_end - self._start
+        if used + size > len(self._recv_buff):
+            buff = bytearray(max(used + size, 2 * len(self._recv_buff)))
+            buff[:used] = self._recv_buff[self._start : self._raw_end]
+            self._recv_buff = buff
+        else:
+            self._recv_buff[:used] = self._recv_buff[self._start : self._raw_end]
+
+        self._end -= self._start
+        self._raw_end -= self._start
+        self._start = 0
+
+    def _decrypt_pending(self) -> None:
+        """Decrypts all complete raw blocks in place"""
+
+        block_size = self.block_size()
+        usable = (self._raw_end - self._end) // block_size * block_size
+        if usable == 0:
+            return
+
+        if not isinstance(self._encryption, NoEncryption):
+            view = memoryview(self._recv_buff)[self._end : self._end + usable]
+            view[:] = self._encryption.decrypt(view)
+            view.release()
+
+        self._end += usable
+
+    def _fill(self, size: int = 0) -> bool:
+        """Reads the next chunk from the socket straight into the receive buffer
+
+        Args:
+            size (int, optional): Amount of bytes still needed by the caller. Defaults to 0.
+
+        Returns:
+            bool: Whether the socket delivered data, `False` once the peer closed the connection
+        """
+
+        # Read as much as fits behind the buffered data, at least one chunk.
+        # The buffer only grows as data arrives, a large `size` alone reserves no memory
+        want = max(
+            min(size, len(self._recv_buff)),
+            EncryptedSocket.RECV_CHUNK,
+            len(self._recv_buff) - self._raw_end,
+        )
+        self._reserve(want)
+
+        with memoryview(self._recv_buff) as view:
+            read = self._socket.recv_into(view[self._raw_end : self._raw_end + want])
+        if read == 0:
+            return False
+
+        self._raw_end += read
+        self._decrypt_pending()
+        return True
+
+    def _available(self) -> int:
+        """
+        Returns:
+            int: Amount of decrypted bytes buffered and not yet read
+        """
+
+        return self._end - self._start
+
+    def buffered(self) -> bool:
+        """Drops the padding behind the last message and checks for data read ahead
+
+        Returns:
+            bool: Whether decrypted bytes of a following message wait in the receive buffer
+        """
+
+        while self._start < self._end and self._recv_buff[self._start] == 0:
+            self._start += 1
+
+        return self._end > self._start
+
+    def recv_view(self, size: int) -> memoryview:
+        """Receives data from the socket without copying it out of the receive buffer
+
+        Args:
+            size (int): Length of data to receive
+
+        Raises:
+            ValueError: Raised when size is less than zero
+
+        Returns:
+            memoryview: The decrypted data, only valid until the next receive on this socket overwrites it, copy it to keep it
+        """
+
+        if size < 0:
+            raise ValueError("Size is less than zero")
+
+        while self._available() < size:
+            if not self._fill(size - self._available()):
+                break
+
+        start = self._start
+        self._start = min(start + size, self._end)
+        return memoryview(self._recv_buff)[start : self._start]
+
     def recv(self, size: int) -> bytes:
         """Receives data from the socket
 
@@ -41,24 +171,36 @@ class EncryptedSocket:
             bytes: The decrypted data read from the socket
         """
 
-        if size < 0:
-            raise ValueError("Size is less than zero")
-        elif size == 0:
+        if size == 0:
             return b""
 
-        data = self._recv_buff
-        block_size = self.block_size()
+        with self.recv_view(size) as view:
+            return bytes(view)
 
-        while len(data) < size:
-            encrypted_block = self._socket.recv(block_size)
-            if not encrypted_block:
-                break
+    def readline(self) -> bytes:
+        """Receives data up to and including the next `\\n`
 
-            decrypted_block = self._encryption.decrypt(encrypted_block)
-            data += decrypted_block
+        Raises:
+            ValueError: Raised when the line is longer than `MAX_LINE`
 
-        self._recv_buff, return_data = data[size:], data[:size]
-        return return_data
+        Returns:
+            bytes: The decrypted line, without `\\n` only if the peer closed the connection before sending one
+        """
+
+        searched = self._start
+
+        while (end := self._recv_buff.find(b"\n", searched, self._end)) < 0:
+            if self._available() > EncryptedSocket.MAX_LINE:
+                raise ValueError("Line exceeds the maximum length")
+
+            offset = self._end - self._start
+            if not self._fill():
+                return self.recv(self._available())
+            searched = self._start + offset
+
+        line = bytes(self._recv_buff[self._start : end + 1])
+        self._start = end + 1
+        return line
 
     def send(self, data: bytes) -> None:
         """
@@ -76,6 +218,93 @@ class EncryptedSocket:
 
         self._send_buff = data[largest_block:]
 
+    def sendmsg(self, buffers: list[bytes]) -> None:
+        """Sends the buffers as one message with a single write and flushes the last block
+
+        Args:
+            buffers (list[bytes]): The parts of the message in order
+        """
+
+        if len(self._send_buff) > 0:
+            buffers = [self._send_buff, *buffers]
+            self._send_buff = b""
+
+        if isinstance(self._encryption, NoEncryption):
+            self._sendall_vectored(buffers)
+            return
+
+        # Gather everything into one pre-sized buffer, so it is encrypted in a single pass
+        size = sum(len(b) for b in buffers)
+        message = bytearray(size + (-size) % self.block_size())  # Pad with null bytes
+        offset = 0
+        for b in buffers:
+            message[offset : offset + len(b)] = b
+            offset += len(b)
+
+        self._socket.sendall(self._encryption.encrypt(message))
+
+    def _sendall_vectored(self, buffers: list[bytes]) -> None:
+        """Writes all buffers without joining them first
+
+        Args:
+            buffers (list[bytes]): The buffers to write in order
+        """
+
+        views = [memoryview(b) for b in buffers if len(b) > 0]
+
+        if not hasattr(self._socket, "sendmsg"):
+            # Windows sockets have no vectored writes
+            self._socket.sendall(b"".join(views))
+            return
+
+        while len(views) > 0:
+            sent = self._socket.sendmsg(views)
+
+            # Drop everything written, the kernel may accept only part of the message
+            while len(views) > 0 and sent >= len(views[0]):
+                sent -= len(views[0])
+                views.pop(0)
+            if sent > 0:
+                views[0] = views[0][sent:]
+
+    def sendfile(
+        self, file: BinaryIO, offset: int, count: int, head: list[bytes] = []
+    ) -> None:
+        """Sends the head followed by a part of the file as one message
+
+        Args:
+            file (BinaryIO): The file opened in binary mode
+            offset (int): Position of the first byte to send
+            count (int): Amount of bytes to send
+            head (list[bytes], optional): Data sent before the file contents. Defaults to [].
+
+        Raises:
+            EOFError: Raised when the file ends before `count` bytes were sent
+
+        Notes:
+            Unencrypted connections let the kernel copy the file, encrypted ones
+            stream it in chunks, so memory use never depends on the file size.
+        """
+
+        if isinstance(self._encryption, NoEncryption):
+            self.sendmsg(head)
+            if count > 0 and self._socket.sendfile(file, offset, count) < count:
+                raise EOFError("File ended before all bytes were sent")
+            return
+
+        for b in head:
+            self.send(b)
+
+        file.seek(offset)
+        while count > 0:
+            chunk = file.read(min(count, EncryptedSocket.SEND_CHUNK))
+            if len(chunk) == 0:
+                raise EOFError("File ended before all bytes were sent")
+            self.send(chunk)
+            count -= len(chunk)
+
+        self.flush()
+
     def flush(self) -> None:
         """Flushes the last block using b'\0' padding"""
 
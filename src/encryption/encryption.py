@@ -81,6 +81,8 @@ class NoEncryption(Encryption):
 
 
 class AesEncryption(Encryption):
+    MODE = "block"
+
     @staticmethod
     def key_len() -> int:
         """
@@ -100,15 +102,25 @@ class AesEncryption(Encryption):
         return 16
 
     def __init__(self, key: bytes, iv: bytes) -> None:
-        """An encryption method using AES256 and CBC
+        """An encryption method using AES256 and CBC, restarted with the same IV for every block
 
         Args:
             key (bytes): The key to use
             iv (bytes): The IV string to use
+
+        Notes:
+            Restarting CBC for each block equals ECB on `block ^ iv`, which lets us
+            process whole buffers with one long-lived ECB context while staying
+            compatible with peers encrypting block by block.
         """
 
         self._aes = algorithms.AES256(key)
-        self._cipher = Cipher(algorithm=self._aes, mode=modes.CBC(iv))
+        self._iv = int.from_bytes(iv)
+        self._iv_len = len(iv)
+
+        cipher = Cipher(algorithm=self._aes, mode=modes.ECB())
+        self._encryptor = cipher.encryptor()
+        self._decryptor = cipher.decryptor()
 
     def block_size(self) -> int:
         """
@@ -118,28 +130,38 @@ class AesEncryption(Encryption):
 
         return self._aes.block_size // 8
 
-    def encrypt(self, data: bytes) -> bytes:
-        """Encrypts the data, while using a different encryptor for each chunk
+    def _xor_iv(self, data: bytes) -> bytes:
+        """XORs every block of the data with the IV
 
         Args:
-            data (bytes): The data to be encrypted, must be full block(s)
+            data (bytes): Full block(s) of data
 
         Returns:
-            bytes: The encrypted data
+            bytes: The data with the IV applied to each block
         """
 
-        encrypted_data = b""
+        blocks = len(data) // self._iv_len
+        if blocks == 0:
+            return b""
+
+        # Repeat the IV over the full length by multiplying with 0x..0001 0..0001
+        ivs = self._iv * int.from_bytes((b"\0" * (self._iv_len - 1) + b"\1") * blocks)
+        return (int.from_bytes(data) ^ ivs).to_bytes(len(data))
+
+    def encrypt(self, data: bytes) -> bytes:
+        """Encrypts the data like a fresh CBC encryptor for each block would
 
-        for i in range(0, len(data), self.block_size()):
-            chunk = data[i : i + self.block_size()]
+        Args:
+            data (bytes): The data to be encrypted, must be full block(s)
 
-            encryptor = self._cipher.encryptor()
-            encrypted_data += encryptor.update(chunk) + encryptor.finalize()
+        Returns:
+            bytes: The encrypted data
+        """
 
-        return encrypted_data
+        return self._encryptor.update(self._xor_iv(data))
 
     def decrypt(self, data: bytes) -> bytes:
-        """Decrypts the data, while using a different decryptor for each chunk
+        """Decrypts the data like a fresh CBC decryptor for each block would
 
         Args:
             data (bytes): The data to be decrypted, must be full block(s)
@@ -148,12 +170,71 @@ class AesEncryption(Encryption):
             bytes: The decrypted data
         """
 
-        decrypted_data = b""
+        return self._xor_iv(self._decryptor.update(data))
+
+
+class AesStreamEncryption(Encryption):
+    MODE = "stream"
+
+    @staticmethod
+    def key_len() -> int:
+        """
+        Returns:
+            int: The length of key required for this encryption method
+        """
+
+        return 32
+
+    @staticmethod
+    def iv_len() -> int:
+        """
+        Returns:
+            int: The length of the nonce required per direction
+        """
+
+        return 16
+
+    def __init__(self, key: bytes, send_iv: bytes, recv_iv: bytes) -> None:
+        """An encryption method using AES256 in CTR mode with one running context per direction
+
+        Args:
+            key (bytes): The key to use
+            send_iv (bytes): The nonce used for data we send
+            recv_iv (bytes): The nonce used for data we receive
+        """
+
+        self._aes = algorithms.AES256(key)
+        self._encryptor = Cipher(self._aes, modes.CTR(send_iv)).encryptor()
+        self._decryptor = Cipher(self._aes, modes.CTR(recv_iv)).decryptor()
+
+    def block_size(self) -> int:
+        """
+        Returns:
+            int: The block size used by this encryption, 1 as CTR needs no padding
+        """
 
-        for i in range(0, len(data), self.block_size()):
-            chunk = data[i : i + self.block_size()]
+        return 1
 
-            decryptor = self._cipher.decryptor()
-            decrypted_data += decryptor.update(chunk) + decryptor.finalize()
+    def encrypt(self, data: bytes) -> bytes:
+        """Encrypts the data, continuing the key stream of the previous call
+
+        Args:
+            data (bytes): The data to be encrypted
+
+        Returns:
+            bytes: The encrypted data
+        """
+
+        return self._encryptor.update(data)
+
+    def decrypt(self, data: bytes) -> bytes:
+        """Decrypts the data, continuing the key stream of the previous call
+
+        Args:
+            data (bytes): The data to be decrypted
+
+        Returns:
+            bytes: The decrypted data
+        """
 
-        return decrypted_data
+        return self._decryptor.update(data)
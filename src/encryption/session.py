@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+import time
+
+from encryption.encryption import AesStreamEncryption
+
+
+class Session:
+    NONCE_LEN = 16
+    TTL = 3600
+
+    def __init__(self, session_id: str, secret: bytes, ttl: float, peer: str) -> None:
+        """A secret shared after a DH key exchange, used to skip it for later connections
+
+        Args:
+            session_id (str): The id the server issued for this session
+            secret (bytes): The secret derived from the exchanged `K`
+            ttl (float): Seconds this session may be resumed for
+            peer (str): The IP of the other side
+        """
+
+        self.session_id = session_id
+        self.peer = peer
+        self._secret = secret
+        self._expires = time.monotonic() + ttl
+
+    @staticmethod
+    def make_id() -> str:
+        """
+        Returns:
+            str: A new random session id
+        """
+
+        return os.urandom(16).hex()
+
+    @staticmethod
+    def make_nonce() -> bytes:
+        """
+        Returns:
+            bytes: A new random nonce for one resumed connection
+        """
+
+        return os.urandom(Session.NONCE_LEN)
+
+    def expired(self) -> bool:
+        """
+        Returns:
+            bool: Whether this session may no longer be resumed
+        """
+
+        return time.monotonic() >= self._expires
+
+    def _derive(
+        self, id: bytes, length: int, client_nonce: bytes, server_nonce: bytes
+    ) -> bytes:
+        """Derives connection specific key material from the session secret
+
+        Args:
+            id (bytes): The ID of the string to generate
+            length (int): The length of data to return. Maximum 32 bytes.
+            client_nonce (bytes): The nonce sent by the client
+            server_nonce (bytes): The nonce sent by the server
+
+        Returns:
+            bytes: The derived bytes
+        """
+
+        return hashlib.sha256(self._secret + client_nonce + server_nonce + id).digest()[
+            :length
+        ]
+
+    def make_encryption(
+        self, client_nonce: bytes, server_nonce: bytes, server: bool
+    ) -> AesStreamEncryption:
+        """Makes the encryption for one resumed connection
+
+        Args:
+            client_nonce (bytes): The nonce sent by the client
+            server_nonce (bytes): The nonce sent by the server
+            server (bool): Whether we are the server side of the connection
+
+        Returns:
+            AesStreamEncryption: The encryption with fresh keys for this connection
+        """
+
+        key = self._derive(
+            b"KEY", AesStreamEncryption.key_len(), client_nonce, server_nonce
+        )
+        c2s = self._derive(
+            b"C2S", AesStreamEncryption.iv_len(), client_nonce, server_nonce
+        )
+        s2c = self._derive(
+            b"S2C", AesStreamEncryption.iv_len(), client_nonce, server_nonce
+        )
+
+        if server:
+            return AesStreamEncryption(key, s2c, c2s)
+        return AesStreamEncryption(key, c2s, s2c)
+
+
+class SessionCache:
+    MAX_SESSIONS = 256
+
+    def __init__(self) -> None:
+        """Thread safe store of sessions, dropping expired ones on access"""
+
+        self._sessions: dict[str, Session] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, session: Session) -> None:
+        """
+        Args:
+            key (str): The key to store the session at
+            session (Session): The session to store
+        """
+
+        with self._lock:
+            self._sessions.pop(key, None)
+            if len(self._sessions) >= SessionCache.MAX_SESSIONS:
+                # Dicts keep insertion order, so this is the oldest session
+                del self._sessions[next(iter(self._sessions))]
+            self._sessions[key] = session
+
+    def get(self, key: str) -> Session | None:
+        """
+        Args:
+            key (str): The key of the session
+
+        Returns:
+            Session | None: The session or `None` if unknown or expired
+        """
+
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and session.expired():
+                del self._sessions[key]
+                return None
+            return session
+
+    def remove(self, key: str) -> None:
+        """
+        Args:
+            key (str): The key of the session to forget
+        """
+
+        with self._lock:
+            self._sessions.pop(key, None)
+
+
+SERVER_SESSIONS = SessionCache()
+CLIENT_SESSIONS = SessionCache()
@@ -1,11 +1,12 @@
 import logging
 import os
-from socket import socket
 import traceback
 from typing import Any, Type
 import config
 from device import api
 from device.api import APIFunct
+from device.routes import RouteKind, RouteTable
+from encryption.enc_socket import EncryptedSocket
 from locations import PL_FFUNC
 from utils import dumpb
 from webserver.webrequest import WebRequest, WebResponse
@@ -15,10 +16,12 @@ from log import LOG
 
 FFUNCS: dict[str, Type[APIFunct]] = api.load_dir(PL_FFUNC)
 
+ROUTES = RouteTable().register(RouteKind.FFUNC, FFUNCS)
+
 
 class FrontendRequest(WebRequest):
     def __init__(
-        self, parent, conn: socket, addr: tuple[str, int], args: dict[str, Any]
+        self, parent, conn: EncryptedSocket, addr: tuple[str, int], args: dict[str, Any]
     ) -> None:
         super().__init__(parent, conn, addr, args)
         self.backend_ip = str(args["ip"])
@@ -53,20 +56,20 @@ class FrontendRequest(WebRequest):
 
                 if fargs[0].lower() == "close":
                     LOG.info("Close request recieved")
-                    self._parent._started = False
+                    self._parent.cleanup()
                     return WebResponse(
                         200, "CLOSED", body=dumpb({"message": "Closed!"})
                     )
 
-                for name, fclass in FFUNCS.items():
-                    if name.lower() == fargs[0].lower():
-                        res = fclass(self, fargs[1:], body).api()
+                fclass = ROUTES.get(RouteKind.FFUNC, fargs[0])
+                if fclass is not None:
+                    res = fclass(self, fargs[1:], body).api()
 
-                        if type(response) == dict:
-                            if type(res) == dict:
-                                response |= res
-                            else:
-                                response = res
+                    if type(response) == dict:
+                        if type(res) == dict:
+                            response |= res
+                        else:
+                            response = res
             except Exception:
                 LOG.exception(f"Exception on function `{".".join(fargs)}`")
                 return WebResponse(
@@ -1,5 +1,6 @@
 import logging
 import os
+import queue
 import sys
 import threading
 import time
@@ -20,31 +21,159 @@ LOG = logging.getLogger()
 
 
 class HttpLogger(logging.Handler):
-    def __init__(self, ip: str, port: int, device: "FrontendDevice") -> None:
+    BATCH_SIZE = 50
+    MAX_AGE = 2.0
+    QUEUE_SIZE = 1000
+
+    def __init__(
+        self,
+        ip: str,
+        port: int,
+        device: "FrontendDevice",
+        batch_size: int | None = None,
+        max_age: float | None = None,
+        queue_size: int | None = None,
+    ) -> None:
+        """Sends log records to the backend in batches from a background thread
+
+        Args:
+            ip (str): The IP of the backend
+            port (int): The port of the backend WebServer
+            device (FrontendDevice): The frontend device used for authentification
+            batch_size (int | None, optional): Records after which a batch is sent. Defaults to `HttpLogger.BATCH_SIZE`.
+            max_age (float | None, optional): Seconds after which a batch is sent even if it is not full. Defaults to `HttpLogger.MAX_AGE`.
+            queue_size (int | None, optional): Records kept waiting before new ones are dropped. Defaults to `HttpLogger.QUEUE_SIZE`.
+        """
+
+        super().__init__()
+
         self._ip = ip
         self._port = port
         self._token = device._token
+        self._pool = device._pool
+
+        self._batch_size = max(1, batch_size or HttpLogger.BATCH_SIZE)
+        self._max_age = max_age or HttpLogger.MAX_AGE
+        self._queue: queue.Queue[dict[str, str] | None] = queue.Queue(
+            max(1, queue_size or HttpLogger.QUEUE_SIZE)
+        )
+
+        self._counter_lock = threading.Lock()
+        self._sent = 0
+        self._dropped = 0
+        self._reported = 0
+
+        self._thread = logged_thread(name="HttpLogger", target=self._run, daemon=True)
+        self._thread.start()
 
     def emit(self, record: logging.LogRecord) -> None:
-        from webclient.client_request import WebClient, WebMethod
+        # Records logged while sending would feed back into the next batch
+        if threading.current_thread() is self._thread:
+            return
 
         try:
-            log_entry = self.format(record)
             log_json = {
                 "level": record.levelname,
-                "message": log_entry,
+                "message": self.format(record),
             }
 
             if record.exc_text:
                 log_json["exception"] = record.exc_text
 
+        except Exception:
+            self.handleError(record)
+            return
+
+        try:
+            self._queue.put_nowait(log_json)
+        except queue.Full:
+            with self._counter_lock:
+                self._dropped += 1
+
+    def close(self) -> None:
+        """Sends the records still waiting, giving up after `max_age`"""
+
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=self._max_age)
+                self._thread.join(self._max_age)
+            except queue.Full:
+                pass
+
+        super().close()
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns:
+            dict[str, int]: Amount of records waiting, sent and dropped
+        """
+
+        with self._counter_lock:
+            return {
+                "waiting": self._queue.qsize(),
+                "sent": self._sent,
+                "dropped": self._dropped,
+            }
+
+    def _run(self) -> None:
+        """Collects records until the batch is full or its first record is `max_age` old"""
+
+        closing = False
+
+        while not closing:
+            record = self._queue.get()
+            if record is None:
+                return
+
+            batch = [record]
+            deadline = time.monotonic() + self._max_age
+
+            while len(batch) < self._batch_size:
+                try:
+                    record = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+
+                if record is None:
+                    closing = True
+                    break
+                batch.append(record)
+
+            self._send(batch)
+
+    def _send(self, batch: list[dict[str, str]]) -> None:
+        """Sends a batch in a single request
+
+        Args:
+            batch (list[dict[str, str]]): The records to send
+        """
+
+        from webclient.client_request import WebClient, WebMethod
+
+        with self._counter_lock:
+            dropped = self._dropped - self._reported
+            self._reported = self._dropped
+
+        try:
             WebClient(self._ip, self._port).set_path("/log").set_secure(
                 True
-            ).set_method(WebMethod.POST).authorize(self._token).set_json(
-                log_json
+            ).set_method(WebMethod.POST).set_pool(self._pool).authorize(
+                self._token
+            ).set_json(
+                {"records": batch, "dropped": dropped}
             ).send()
+
+            with self._counter_lock:
+                self._sent += len(batch)
+
         except Exception as e:
-            print(f"Failed to send log: {e}")
+            print(f"Failed to send {len(batch)} log records: {e}")
+
+            with self._counter_lock:
+                self._dropped += len(batch)
+                self._reported -= dropped
 
 
 def init_logger(verbose: bool) -> None:
@@ -82,7 +211,16 @@ def append_http_logger(backend_ip: str, port: int, device: "FrontendDevice") ->
         device (FrontendDevice): The frontend device used for authentification
     """
 
-    http_logger = HttpLogger(backend_ip, port, device)
+    import config
+
+    http_logger = HttpLogger(
+        backend_ip,
+        port,
+        device,
+        config.load_var("remote_log.batch_size", None),
+        config.load_var("remote_log.max_age", None),
+        config.load_var("remote_log.queue_size", None),
+    )
     http_logger.setLevel(logging.WARNING)
     http_logger.setFormatter(_log_formatter)
     LOG.addHandler(http_logger)
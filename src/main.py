@@ -125,6 +125,7 @@ def frontend() -> None | int:
 
 def backend() -> None | int:
     from backend.backend import DEVICES, BackendRequest
+    from backend.sampler import SAMPLER
 
     LOG.info("Starting [BACKEND]...")
     # Start Multicast backend
@@ -145,6 +146,9 @@ def backend() -> None | int:
     Schedule.start_scheduler()
     LOG.info("Started scheduler")
 
+    SAMPLER.start()
+    CLEANUP_STACK.append(SAMPLER)
+
     Automation.load_all()
     LOG.info("Loaded automations")
 
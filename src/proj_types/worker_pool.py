@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+from log import LOG, logged_thread
+
+
+class WorkerPool:
+    def __init__(self, name: str, workers: int, queue_size: int) -> None:
+        """A fixed amount of worker threads consuming a bounded job queue
+
+        Args:
+            name (str): The name given to the worker threads
+            workers (int): Amount of worker threads
+            queue_size (int): Maximum amount of jobs waiting for a worker
+        """
+
+        self._name = name
+        self._queue: queue.Queue[
+            tuple[Callable[..., object], Iterable[Any], float] | None
+        ] = queue.Queue(max(1, queue_size))
+        self._lock = threading.Lock()
+
+        self._submitted = 0
+        self._rejected = 0
+        self._completed = 0
+        self._busy = 0
+        self._max_depth = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        self._workers = [
+            logged_thread(name=f"{name}-{i}", target=self._work, daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for w in self._workers:
+            w.start()
+
+    def submit(self, target: Callable[..., object], args: Iterable[Any] = ()) -> bool:
+        """Queues a job for the next free worker
+
+        Args:
+            target (Callable[..., object]): The function to execute
+            args (Iterable[Any], optional): Arguments for `target`. Defaults to ().
+
+        Returns:
+            bool: Whether the job was queued, `False` if the queue is full
+        """
+
+        try:
+            self._queue.put_nowait((target, args, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            LOG.warning("%s queue full, rejecting job", self._name)
+            return False
+
+        with self._lock:
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, self._queue.qsize())
+        return True
+
+    def _work(self) -> None:
+        """Target method of every worker thread"""
+
+        while (job := self._queue.get()) is not None:
+            target, args, queued_at = job
+            waited = time.monotonic() - queued_at
+
+            with self._lock:
+                self._busy += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+            try:
+                target(*args)
+            except Exception:
+                LOG.exception("Caught exception in %s worker:", self._name)
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self._completed += 1
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Returns:
+            dict[str, int | float]: Current queue depth, job counters and wait times in seconds
+        """
+
+        with self._lock:
+            started = self._completed + self._busy
+            return {
+                "workers": len(self._workers),
+                "busy": self._busy,
+                "depth": self._queue.qsize(),
+                "max_depth": self._max_depth,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "completed": self._completed,
+                "wait_avg": self._wait_total / started if started else 0.0,
+                "wait_max": self._wait_max,
+            }
+
+    def shutdown(self) -> None:
+        """Lets every worker exit after finishing the jobs already queued"""
+
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                # Workers are daemon threads and die with the process anyways
+                break
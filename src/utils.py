@@ -15,6 +15,9 @@ import cv2
 
 from log import LOG
 
+# Some systems map `.ts` to Qt translation files, the timelapse is an MPEG transport stream
+mimetypes.add_type("video/mp2t", ".ts")
+
 
 class CaseInsensitiveDict[_T]:
     def __init__(self, data: dict[str, _T] | None = None) -> None:
@@ -2,13 +2,16 @@ from enum import Enum
 import json
 import logging
 import socket
+import time
 from typing import Any
 
 from encryption.dh_key_ex import DHClient, DHServer
 from encryption.enc_socket import EncryptedSocket
-from encryption.encryption import AesEncryption
+from encryption.encryption import AesEncryption, AesStreamEncryption
+from encryption.session import CLIENT_SESSIONS, Session
 import locations
 from webclient.client_response import ClientResponse
+from webclient.connection_pool import ConnectionPool
 
 from log import LOG
 
@@ -64,6 +67,7 @@ class WebClient:
         self._json: dict[str, Any] = {}
         self._data: tuple[bytes, str] | None = None
         self._secure: bool = False
+        self._pool: ConnectionPool | None = None
 
     def set_secure(self, secure: bool) -> "WebClient":
         """
@@ -77,6 +81,18 @@ class WebClient:
         self._secure = secure
         return self
 
+    def set_pool(self, pool: ConnectionPool | None) -> "WebClient":
+        """
+        Args:
+            pool (ConnectionPool | None): The pool to reuse connections from and return them to
+
+        Returns:
+            WebClient: Returns `self`, used for chaining
+        """
+
+        self._pool = pool
+        return self
+
     def add_header(self, key: str, val: str) -> "WebClient":
         """
         Args:
@@ -213,24 +229,16 @@ class WebClient:
             self.add_header("Authorization", f"BEARER {token}")
         return self
 
-    def _send_status(self, sock: EncryptedSocket) -> None:
-        """Sends the status line
-
-        Args:
-            sock (EncryptedSocket): The socket to send to
+    def _encode_head(self) -> bytes:
         """
-
-        sock.send(f"{self._method.value} {self._path} {WebClient.VERSION}\r\n".encode())
-
-    def _send_headers(self, sock: EncryptedSocket) -> None:
-        """Sends all defined headers
-
-        Args:
-            sock (EncryptedSocket): The socket to send to
+        Returns:
+            bytes: The status line and all defined headers, ended by an empty line
         """
 
-        for k, v in self._headers.items():
-            sock.send(f"{k}: {str(v)}\r\n".encode())
+        lines = [f"{self._method.value} {self._path} {WebClient.VERSION}\r\n"]
+        lines.extend(f"{k}: {str(v)}\r\n" for k, v in self._headers.items())
+        lines.append("\r\n")
+        return "".join(lines).encode()
 
     def _send_secure(self, sock: EncryptedSocket) -> None:
         """Sends the `SECURE` protocol request
@@ -241,18 +249,20 @@ class WebClient:
 
         dh = DHClient()
 
-        # Sends the first HTTP/1.1 request with the `SECURE` method
-        # and the value of `e` used in the DH key exchange
-        sock.send(
-            "\r\n".join(
-                [
-                    f"{WebMethod.SECURE.value} * {WebClient.VERSION}",
-                    f"DH-E: {str(dh.get_e())}",
-                    "\r\n",
-                ]
-            ).encode()
+        # Sends the first HTTP/1.1 request with the `SECURE` method,
+        # the value of `e` used in the DH key exchange and the encryption modes we support
+        sock.sendmsg(
+            [
+                "\r\n".join(
+                    [
+                        f"{WebMethod.SECURE.value} * {WebClient.VERSION}",
+                        f"DH-E: {str(dh.get_e())}",
+                        f"Enc-Mode: {AesStreamEncryption.MODE}, {AesEncryption.MODE}",
+                        "\r\n",
+                    ]
+                ).encode()
+            ]
         )
-        sock.flush()
 
         # Receives the response for the secure request
         # and reads the transmitted value of `f`
@@ -261,14 +271,78 @@ class WebClient:
         LOG.debug("Finished SECURE handshake with %s, changing encryption", self._ip)
 
         # Updates the encryption of the socket to use the key `K`
-        # generated by the DH key exchange
-        sock.update_encryption(
-            AesEncryption(
-                dh.make_enc_key(AesEncryption.key_len()),
-                dh.make_iv_str(AesEncryption.iv_len()),
+        # generated by the DH key exchange, servers not answering
+        # with an `Enc-Mode` only support the block mode
+        key = dh.make_enc_key(AesEncryption.key_len())
+        if secure_resp.get_header("Enc-Mode") == AesStreamEncryption.MODE:
+            c2s, s2c = dh.make_stream_ivs(AesStreamEncryption.iv_len())
+            sock.update_encryption(AesStreamEncryption(key, c2s, s2c))
+        else:
+            sock.update_encryption(
+                AesEncryption(key, dh.make_iv_str(AesEncryption.iv_len()))
+            )
+
+        # Remembers the session the server issued, so the next
+        # connection can skip the key exchange
+        if (session_id := secure_resp.get_header("Session-Id")) is not None:
+            CLIENT_SESSIONS.add(
+                self._session_key(),
+                Session(
+                    session_id,
+                    dh.make_session_secret(),
+                    float(secure_resp.get_header("Session-TTL") or 0),
+                    self._ip,
+                ),
             )
+
+    def _send_resume(self, sock: EncryptedSocket, session: Session) -> bool:
+        """Sends the `SECURE` protocol request resuming an earlier session
+
+        Args:
+            sock (EncryptedSocket): The socket to change the protocol of
+            session (Session): The session to resume
+
+        Returns:
+            bool: Whether the server resumed the session
+        """
+
+        nonce = Session.make_nonce()
+        sock.sendmsg(
+            [
+                "\r\n".join(
+                    [
+                        f"{WebMethod.SECURE.value} * {WebClient.VERSION}",
+                        f"Session-Id: {session.session_id}",
+                        f"Session-Nonce: {nonce.hex()}",
+                        f"Enc-Mode: {AesStreamEncryption.MODE}",
+                        "\r\n",
+                    ]
+                ).encode()
+            ]
         )
 
+        try:
+            secure_resp = ClientResponse(sock, True)
+            if secure_resp.code != 101:
+                raise ValueError(f"Server answered {secure_resp.code}")
+
+            server_nonce = bytes.fromhex(str(secure_resp.get_header("Session-Nonce")))
+        except (OSError, ValueError):
+            LOG.debug("Session with %s could not be resumed", self._ip, exc_info=True)
+            CLIENT_SESSIONS.remove(self._session_key())
+            return False
+
+        sock.update_encryption(session.make_encryption(nonce, server_nonce, False))
+        return True
+
+    def _session_key(self) -> str:
+        """
+        Returns:
+            str: The key of the session with this server
+        """
+
+        return f"{self._ip}:{self._port}"
+
     def _send_request(self, sock: EncryptedSocket) -> None:
         """Sends the user-defined request
 
@@ -285,21 +359,21 @@ class WebClient:
             self._headers["Content-Type"] = self._data[1]
             self._headers["Content-Length"] = len(self._data[0])
 
-        # Sends the HTTP request and body if provided
-        self._send_status(sock)
-        self._send_headers(sock)
-        sock.send(b"\r\n")
-
+        # Sends the HTTP request and body if provided in one write,
+        # padding the last encrypted block using b'\0'
         if has_body:
             # Ignore warning for self._data maybe being None,
             # because it gets set in the IF statement above
-            sock.send(self._data[0])  # type: ignore
-        # Flush the last encrypted block using b'\0' padding
-        sock.flush()
+            sock.sendmsg([self._encode_head(), self._data[0]])  # type: ignore
+        else:
+            sock.sendmsg([self._encode_head()])
 
-    def send(self) -> ClientResponse:
+    def send(self, stream: bool = False) -> ClientResponse:
         """Send this request using everything set beforehand
 
+        Args:
+            stream (bool, optional): Whether to leave the body for `ClientResponse.read_into` instead of reading it into memory. Defaults to False.
+
         Returns:
             ClientResponse: The response of the server
         """
@@ -311,20 +385,89 @@ class WebClient:
             self._ip,
             self._port,
         )
-        # Creates socket and connects to server
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        sock.connect((self._ip, self._port))
-        enc_sock = EncryptedSocket(sock)
-
-        # Sends the `SECURE` request when selected
+        # Streamed responses own their connection until the body was read
+        pooled = self._pool is not None and not stream
+        self._headers["Connection"] = "keep-alive" if pooled else "close"
+
+        # Reuses an idle connection to this server, which is already secured if needed
+        if pooled and self._pool is not None:
+            key = ConnectionPool.key(self._ip, self._port, self._secure)
+            if (enc_sock := self._pool.acquire(key)) is not None:
+                try:
+                    return self._exchange(enc_sock, False)
+                except ConnectionError:
+                    # The server closed the idle connection before reading our request
+                    LOG.debug("Pooled connection to %s went stale", self._ip)
+                    enc_sock.close()
+
+        enc_sock = self._connect()
+
+        # Sends the `SECURE` request when selected,
+        # resuming the last session with this server if possible
         if self._secure:
-            self._send_secure(enc_sock)
+            start = time.perf_counter()
+            resumed = False
+
+            if (session := CLIENT_SESSIONS.get(self._session_key())) is not None:
+                resumed = self._send_resume(enc_sock, session)
+                if not resumed:
+                    enc_sock.close()
+                    enc_sock = self._connect()
+
+            if not resumed:
+                self._send_secure(enc_sock)
+
+            LOG.debug(
+                "SECURE handshake with %s took %.2fms (%s)",
+                self._ip,
+                (time.perf_counter() - start) * 1000,
+                "resumed" if resumed else "key exchange",
+            )
 
         # Sends the normal request using the already set encryption
-        self._send_request(enc_sock)
+        return self._exchange(enc_sock, stream)
 
-        return ClientResponse(enc_sock)
+    def _exchange(self, sock: EncryptedSocket, stream: bool) -> ClientResponse:
+        """Sends the request and reads the response, returning the connection to the pool if possible
+
+        Args:
+            sock (EncryptedSocket): The connected socket, already secured if needed
+            stream (bool): Whether to leave the body on the socket
+
+        Returns:
+            ClientResponse: The response of the server
+        """
+
+        self._send_request(sock)
+        if self._pool is None or stream:
+            return ClientResponse(sock, stream=stream)
+
+        try:
+            resp = ClientResponse(sock, True)
+        except Exception:
+            sock.close()
+            raise
+
+        if resp.keep_alive:
+            self._pool.release(
+                ConnectionPool.key(self._ip, self._port, self._secure), sock
+            )
+        else:
+            sock.close()
+        return resp
+
+    def _connect(self) -> EncryptedSocket:
+        """Creates socket and connects to server
+
+        Returns:
+            EncryptedSocket: The connected socket, not encrypted yet
+        """
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.connect((self._ip, self._port))
+        return EncryptedSocket(sock)
 
     def _default_headers(self) -> dict[str, str]:
         """
@@ -334,7 +477,7 @@ class WebClient:
 
         return {
             "Accept": "*/*",
-            # TODO maybe Accept-Encoding
+            "Accept-Encoding": "gzip, deflate",
             "Cache-Control": "no-cache",
             "User-Agent": f"JoaNetAPI/{locations.VERSION}",
         }
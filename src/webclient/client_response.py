@@ -1,18 +1,27 @@
 import socket
-from typing import Any, TypeVar
+from typing import Any, BinaryIO, TypeVar
+import zlib
 
 from encryption.enc_socket import EncryptedSocket
 from utils import CaseInsensitiveDict
 
 
 class ClientResponse:
-    def __init__(self, sock: EncryptedSocket, keep_alive: bool = False) -> None:
+    STREAM_CHUNK = 65536
+
+    def __init__(
+        self, sock: EncryptedSocket, keep_alive: bool = False, stream: bool = False
+    ) -> None:
         self._sock = sock
         self._keep_alive = keep_alive
 
         self._read_status()
         self._read_headers()
-        self._read_body()
+
+        # Streamed bodies are left on the socket for `read_into`
+        self._data = b""
+        if not stream:
+            self._read_body()
 
     def _read_line(self) -> str:
         """Reads one line of the incoming data
@@ -21,21 +30,17 @@ class ClientResponse:
             str: The line read
         """
 
-        buffer = []
-
-        # Read one byte at a time into `buffer` until \n is encountered
-        while (r := self._sock.recv(1)) != b"\n":
-            buffer.append(r)
-
-        # Append \n because the loop exited without writing it
-        buffer.append(b"\n")
-
-        return b"".join(buffer).decode()
+        return self._sock.readline().decode()
 
     def _read_status(self) -> None:
         """Reads the status line and parses it"""
 
-        _, code, self._msg = self._read_line().split(" ", 2)
+        # Block encrypted connections pad the end of the last response with b"\0"
+        line = self._read_line().lstrip("\0")
+        if len(line) == 0:
+            raise ConnectionResetError("Connection closed before a response was sent")
+
+        _, code, self._msg = line.split(" ", 2)
         self._code = int(code)
 
     def _read_headers(self) -> None:
@@ -51,19 +56,68 @@ class ClientResponse:
     def _read_body(self) -> None:
         """Reads the body if sent and closes socket depending on `self._close_after`"""
 
-        # Checks if data should be received
-        self._data = b""
-        if not ("Content-Type" in self._headers and "Content-Length" in self._headers):
-            return
+        # Reads data from socket if sent, the length is needed to find
+        # the end of the response on connections kept alive
+        if "Content-Length" in self._headers:
+            con_len = int(self._headers["Content-Length"])
+            self._data = self._sock.recv(con_len)
 
-        # Reads data from socket
-        con_len = int(self._headers["Content-Length"])
-        self._data = self._sock.recv(con_len)
+            if (decoder := self._decoder()) is not None:
+                self._data = decoder.decompress(self._data) + decoder.flush()
 
         # Closes socket if not keeping alive
         if not self._keep_alive:
             self._sock.close()
 
+    def read_into(self, file: BinaryIO) -> int:
+        """Writes the body of a streamed response to a file chunk by chunk
+
+        Args:
+            file (BinaryIO): The file opened in binary mode
+
+        Raises:
+            ConnectionResetError: Raised when the connection closes before the whole body arrived
+
+        Returns:
+            int: Amount of bytes written
+        """
+
+        remaining = int(self._headers.get("Content-Length") or 0)
+        written = 0
+        decoder = self._decoder()
+
+        try:
+            while remaining > 0:
+                with self._sock.recv_view(
+                    min(remaining, ClientResponse.STREAM_CHUNK)
+                ) as view:
+                    if len(view) == 0:
+                        raise ConnectionResetError("Connection closed during the body")
+                    remaining -= len(view)
+                    written += file.write(
+                        view if decoder is None else decoder.decompress(view)
+                    )
+
+            if decoder is not None:
+                written += file.write(decoder.flush())
+        finally:
+            if not self._keep_alive:
+                self._sock.close()
+
+        return written
+
+    def _decoder(self) -> "zlib._Decompress | None":
+        """
+        Returns:
+            zlib._Decompress | None: A decoder for the `Content-Encoding` of the body or `None` if it is not encoded
+        """
+
+        encoding = (self._headers.get("Content-Encoding") or "").strip().lower()
+        if encoding in ("gzip", "deflate"):
+            # Detects the zlib and the gzip header by itself
+            return zlib.decompressobj(zlib.MAX_WBITS | 32)
+        return None
+
     def get_header(self, key: str, default: str | None = None) -> str | None:
         """Gets the header of the response by key or returns a default value if not existent
 
@@ -77,6 +131,15 @@ class ClientResponse:
 
         return self._headers.get(key, default)
 
+    @property
+    def keep_alive(self) -> bool:
+        """
+        Returns:
+            bool: Whether the server keeps the connection open for another request
+        """
+
+        return self._headers.get("Connection", "").lower() == "keep-alive"
+
     @property
     def code(self) -> int:
         return self._code
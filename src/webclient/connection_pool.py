@@ -0,0 +1,75 @@
+import threading
+import time
+
+from encryption.enc_socket import EncryptedSocket
+
+
+class ConnectionPool:
+    # Below the server's keep-alive timeout, so we never pick a connection it is about to close
+    IDLE_TIMEOUT = 10
+    MAX_IDLE = 4
+
+    def __init__(self) -> None:
+        """Keeps connections open after a response so later requests to the same server can reuse them"""
+
+        self._idle: dict[str, list[tuple[EncryptedSocket, float]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(ip: str, port: int, secure: bool) -> str:
+        """
+        Args:
+            ip (str): The IP of the server
+            port (int): The port of the server
+            secure (bool): Whether the connection was upgraded using the `SECURE` protocol
+
+        Returns:
+            str: The key the connections to this server are stored at
+        """
+
+        return f"{ip}:{port}:{'secure' if secure else 'plain'}"
+
+    def acquire(self, key: str) -> EncryptedSocket | None:
+        """Takes an idle connection out of the pool
+
+        Args:
+            key (str): The key of the server
+
+        Returns:
+            EncryptedSocket | None: The most recently used connection or `None` if no usable one is idle
+        """
+
+        with self._lock:
+            conns = self._idle.get(key, [])
+            while len(conns) > 0:
+                sock, since = conns.pop()
+                if time.monotonic() - since < ConnectionPool.IDLE_TIMEOUT:
+                    return sock
+                sock.close()
+
+        return None
+
+    def release(self, key: str, sock: EncryptedSocket) -> None:
+        """Puts a connection back into the pool after its response was read
+
+        Args:
+            key (str): The key of the server
+            sock (EncryptedSocket): The connection to keep open
+        """
+
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if len(conns) < ConnectionPool.MAX_IDLE:
+                conns.append((sock, time.monotonic()))
+                return
+
+        sock.close()
+
+    def clear(self) -> None:
+        """Closes all idle connections"""
+
+        with self._lock:
+            for conns in self._idle.values():
+                for sock, _ in conns:
+                    sock.close()
+            self._idle.clear()
@@ -2,8 +2,29 @@ import zlib
 import gzip
 
 
+# Bodies below this size fit into one packet anyways
+MIN_SIZE = 1024
+# Compressed bodies must save at least this share to be worth the decoding
+MAX_RATIO = 0.9
+
+# Bodies built per request only get the fast levels, static files are compressed once
+DYNAMIC_LEVEL = 6
+STATIC_LEVEL = 9
+
+# Already compressed formats like JPEG, PNG or zip are left alone
+COMPRESSIBLE = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "image/vnd.microsoft.icon",
+    "image/x-icon",
+)
+
+
 def deflate(data: bytes, compresslevel: int = 9) -> bytes:
-    """Deflates the data
+    """Deflates the data into the zlib format used by the `deflate` encoding
 
     Args:
         data (bytes): Data to be deflated
@@ -14,14 +35,14 @@ def deflate(data: bytes, compresslevel: int = 9) -> bytes:
     """
 
     compress = zlib.compressobj(
-        compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, 0
+        compresslevel, zlib.DEFLATED, zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, 0
     )
     deflated = compress.compress(data)
     deflated += compress.flush()
     return deflated
 
 
-def gzip_compress(data: bytes, compresslevel: int = 9):
+def gzip_compress(data: bytes, compresslevel: int = 9) -> bytes:
     """Compresses the data using GZip
 
     Args:
@@ -29,13 +50,76 @@ def gzip_compress(data: bytes, compresslevel: int = 9):
         compresslevel (int, optional): Compression level. Defaults to 9.
 
     Returns:
-        _type_: _description_
+        bytes: The compressed body
     """
 
-    return gzip.compress(data, compresslevel)
+    return gzip.compress(data, compresslevel, mtime=0)
 
 
+# Supported encodings in order of preference
 ENCODINGS = [
-    #("deflate", deflate),
-    #("gzip", gzip_compress),
+    ("gzip", gzip_compress),
+    ("deflate", deflate),
 ]
+
+
+def compressible(mime: str, size: int) -> bool:
+    """
+    Args:
+        mime (str): The `Content-Type` of the body
+        size (int): The length of the body
+
+    Returns:
+        bool: Whether compressing the body can pay off
+    """
+
+    return size >= MIN_SIZE and mime.lower().startswith(COMPRESSIBLE)
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """Picks the encoding the client prefers using the q-values of `Accept-Encoding`
+
+    Args:
+        accept_encoding (str | None): The `Accept-Encoding` header of the request
+
+    Returns:
+        str | None: The name of the encoding or `None` to send the body as it is
+    """
+
+    if not accept_encoding:
+        return None
+
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for name, _ in ENCODINGS:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+
+    return best
+
+
+def compress(encoding: str, data: bytes, compresslevel: int) -> bytes:
+    """
+    Args:
+        encoding (str): The name of the encoding, one of `ENCODINGS`
+        data (bytes): Data to be compressed
+        compresslevel (int): Compression level
+
+    Returns:
+        bytes: The compressed body
+    """
+
+    return dict(ENCODINGS)[encoding](data, compresslevel)
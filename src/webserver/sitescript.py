@@ -3,8 +3,10 @@ import importlib
 import importlib.util
 import logging
 import os
+import re
+import threading
 import traceback
-from typing import Any, Type
+from typing import Any, BinaryIO, Callable, Type
 
 
 from log import LOG
@@ -16,6 +18,12 @@ class SiteScript(ABC):
         self.get_args = getargs
         self.headers = {}
 
+        # Path or opened file, offset and length of a file part streamed instead of the site
+        self.stream: tuple[str | BinaryIO, int, int] | None = None
+
+        # Status of the response, no site is sent with any other than `200`
+        self.status: tuple[int, str] = (200, "OK")
+
     @abstractmethod
     def display(self) -> None:
         """Perform site manipulation"""
@@ -29,20 +37,101 @@ class SiteScript(ABC):
             sitefile (str): The path to the file to be read
 
         Returns:
-            bytes: The contents of the file, manipulated by the SiteScript
+            bytes: The contents of the file, manipulated by the SiteScript, or nothing if the SiteScript streams a file or answers with another status
         """
 
         self.display()
 
-        with open(sitefile, "rb") as rf:
-            content = rf.read()
+        if self.stream is not None or self.status[0] != 200:
+            return b""
+
+        return TEMPLATES.get(sitefile).render(self.page_vars)
+
+
+class Template:
+    # Matches `%%var%%`, names never contain whitespace or `%`
+    VARIABLE = re.compile(rb"%%([^%\s]+)%%")
+
+    def __init__(self, content: bytes) -> None:
+        """A site split into its literal parts and `%%var%%` placeholders
+
+        Args:
+            content (bytes): The contents of the site
+        """
+
+        self._content = content
+
+        # Even indices hold literal parts, odd ones the variable names
+        parts = Template.VARIABLE.split(content)
+        self._segments: list[bytes] = parts
+        self._names: list[tuple[int, str]] = [
+            (i, parts[i].decode(errors="ignore")) for i in range(1, len(parts), 2)
+        ]
+
+    def render(self, page_vars: dict[str, str | bytes]) -> bytes:
+        """Substitutes all placeholders in a single join
+
+        Args:
+            page_vars (dict[str, str | bytes]): The values of the variables
+
+        Returns:
+            bytes: The site with every known variable substituted
+        """
+
+        if len(self._names) == 0 or len(page_vars) == 0:
+            return self._content
+
+        segments = self._segments.copy()
+        for i, name in self._names:
+            if name in page_vars:
+                v = page_vars[name]
+                segments[i] = v.encode() if isinstance(v, str) else v
+            else:
+                # Unknown placeholders stay as they are
+                segments[i] = b"%%" + segments[i] + b"%%"
 
-        for k, v in self.page_vars.items():
-            content = content.replace(
-                f"%%{k}%%".encode(), v.encode() if isinstance(v, str) else v
-            )
+        return b"".join(segments)
 
-        return content
+
+class FileCache[_T]:
+    def __init__(self, loader: Callable[[str], _T]) -> None:
+        """Keeps the result of loading a file until the file changes
+
+        Args:
+            loader (Callable[[str], _T]): Loads the file at the given path
+        """
+
+        self._loader = loader
+        self._entries: dict[str, tuple[int, int, _T]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> _T:
+        """
+        Args:
+            path (str): The path of the file
+
+        Raises:
+            OSError: Raised when the file can not be accessed
+
+        Returns:
+            _T: The loaded file, loaded again only if its modification time or size changed
+        """
+
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                return entry[2]
+
+        value = self._loader(path)
+        with self._lock:
+            self._entries[path] = (stat.st_mtime_ns, stat.st_size, value)
+        return value
+
+
+def _load_template(path: str) -> Template:
+    with open(path, "rb") as rf:
+        return Template(rf.read())
 
 
 def load_script_file(pldir: str, f: str) -> Type[SiteScript] | None:
@@ -81,3 +170,10 @@ def load_script_file(pldir: str, f: str) -> Type[SiteScript] | None:
     except Exception:
         LOG.exception("Plugin %s did not load successfully:", f)
         traceback.print_exc()
+
+
+# Sites and SiteScripts by path, reloaded only once the file changed
+TEMPLATES: FileCache[Template] = FileCache(_load_template)
+SITE_SCRIPTS: FileCache[Type[SiteScript] | None] = FileCache(
+    lambda path: load_script_file(os.path.dirname(path), os.path.basename(path))
+)
@@ -0,0 +1,330 @@
+from collections import OrderedDict
+import email.utils
+import os
+import threading
+from typing import Callable
+
+from utils import mime_by_ext
+from webserver.compression_util import MAX_RATIO, STATIC_LEVEL, compress, compressible
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parses a `Range` header asking for a single byte range
+
+    Args:
+        header (str): The value of the header, e.g. `bytes=100-` or `bytes=-500`
+        size (int): The size of the complete file
+
+    Raises:
+        ValueError: Raised when the range lies completely outside of the file
+
+    Returns:
+        tuple[int, int] | None: Offset and length of the range or `None` if the header is not understood and the whole file is to be sent
+    """
+
+    unit, _, ranges = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        # Multiple ranges are optional, sending everything is a valid answer
+        return None
+
+    first, sep, last = (s.strip() for s in ranges.partition("-"))
+    if not sep or not (first or last):
+        return None
+    if (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+
+    if not first:
+        # Suffix range with the last N bytes
+        length = min(int(last), size)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return size - length, length
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+    return start, end - start + 1
+
+
+class PublicFile:
+    def __init__(
+        self,
+        path: str,
+        data: bytes | None,
+        mtime_ns: int,
+        size: int,
+        on_variant: Callable[["PublicFile", int], None] | None = None,
+    ) -> None:
+        """One file of a public directory as read from disk
+
+        Args:
+            path (str): The path of the file
+            data (bytes | None): The contents of the file or `None` for files too large to hold in memory
+            mtime_ns (int): The modification time the contents were read at
+            size (int): The size the contents were read at
+            on_variant (Callable[[PublicFile, int], None] | None, optional): Called with the size of every compressed variant kept in memory. Defaults to None.
+        """
+
+        self.path = path
+        self.data = data
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.mime = mime_by_ext(path)
+        self._variants: dict[str, bytes | None] = {}
+        self._on_variant = on_variant
+
+        # Bytes of this file counted against the budget of the cache holding it
+        self.charged = 0
+
+        # Size and modification time identify a version without hashing the contents
+        self.etag = f'"{size:x}-{mtime_ns:x}"'
+        self.last_modified = email.utils.formatdate(mtime_ns / 1e9, usegmt=True)
+
+    def encoded(self, encoding: str) -> bytes | None:
+        """Gets the contents compressed with the strongest level, compressing only once per version
+
+        Args:
+            encoding (str): The name of the encoding
+
+        Returns:
+            bytes | None: The compressed contents or `None` if compressing does not pay off
+        """
+
+        if self.data is None:
+            return None
+
+        if encoding not in self._variants:
+            body = compress(encoding, self.data, STATIC_LEVEL)
+            variant = body if len(body) < len(self.data) * MAX_RATIO else None
+
+            # Requests compressing the same variant at once keep only the first one
+            kept = self._variants.setdefault(encoding, variant)
+            if kept is variant and variant is not None and self._on_variant:
+                self._on_variant(self, len(variant))
+
+        return self._variants[encoding]
+
+    def headers(self, encoding: str | None = None) -> dict[str, str]:
+        """
+        Args:
+            encoding (str | None, optional): The encoding of the sent variant. Defaults to None.
+
+        Returns:
+            dict[str, str]: The validators clients can revalidate their copy with
+        """
+
+        headers = {
+            # Every variant needs its own ETag
+            "ETag": self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"',
+            "Last-Modified": self.last_modified,
+            "Cache-Control": "no-cache",
+            "Accept-Ranges": "bytes",
+        }
+
+        if compressible(self.mime, self.size):
+            headers["Vary"] = "Accept-Encoding"
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+
+        return headers
+
+    def matches(self, if_range: str | None) -> bool:
+        """
+        Args:
+            if_range (str | None): The `If-Range` header of the request
+
+        Returns:
+            bool: Whether a range of this version may be sent, `False` if the client holds parts of another version
+        """
+
+        return if_range is None or if_range.strip() in (self.etag, self.last_modified)
+
+    def not_modified(
+        self, if_none_match: str | None, if_modified_since: str | None
+    ) -> bool:
+        """Checks the conditional headers of a request against this version
+
+        Args:
+            if_none_match (str | None): The `If-None-Match` header of the request
+            if_modified_since (str | None): The `If-Modified-Since` header of the request
+
+        Returns:
+            bool: Whether the client's copy is still current and a `304` suffices
+        """
+
+        # `If-None-Match` takes precedence, `If-Modified-Since` is ignored if present
+        if if_none_match is not None:
+            tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+            return "*" in tags or any(
+                t == self.etag or t.startswith(f"{self.etag[:-1]}-") for t in tags
+            )
+
+        if if_modified_since is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return self.mtime_ns // 1_000_000_000 <= since.timestamp()
+
+        return False
+
+
+class StaticFiles:
+    def __init__(self, root: str, budget: int) -> None:
+        """Index and LRU content cache of a public directory
+
+        Args:
+            root (str): The directory to serve files from
+            budget (int): Maximum amount of bytes kept in memory
+        """
+
+        self._root = root
+        self._budget = budget
+        self._max_entry = budget // 4
+        self._lock = threading.Lock()
+
+        self._dir_mtime = -1
+        self._index: dict[str, str] = {}
+
+        self._cache: OrderedDict[str, PublicFile] = OrderedDict()
+        self._used = 0
+        self._hits = 0
+        self._misses = 0
+
+    def _refresh_index(self) -> None:
+        """Rebuilds the index once files were added, removed or renamed"""
+
+        try:
+            mtime = os.stat(self._root).st_mtime_ns
+        except FileNotFoundError:
+            self._index = {}
+            return
+
+        if mtime == self._dir_mtime:
+            return
+
+        index: dict[str, str] = {}
+        for f in sorted(os.listdir(self._root)):
+            name, ext = os.path.splitext(f)
+            # SiteScripts are code, never content
+            if ext.lower() == ".py" or not os.path.isfile(os.path.join(self._root, f)):
+                continue
+
+            # Full names win over names without extension
+            index.setdefault(name.lower(), f)
+            index[f.lower()] = f
+
+        self._index = index
+        self._dir_mtime = mtime
+
+    def find(self, path: str) -> str | None:
+        """Looks up the file for a requested path
+
+        Args:
+            path (str): The requested path, with or without the extension
+
+        Returns:
+            str | None: The name of the file or `None` if there is none
+        """
+
+        with self._lock:
+            self._refresh_index()
+            return self._index.get(path.strip("/").lower())
+
+    def load(self, fname: str) -> PublicFile | None:
+        """Gets the current version of a file, reading it only if it changed since the last call
+
+        Args:
+            fname (str): The name of the file
+
+        Returns:
+            PublicFile | None: The file or `None` if it does not exist
+        """
+
+        path = os.path.join(self._root, fname)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        # Large files are streamed from disk when sent
+        if stat.st_size > self._max_entry:
+            with self._lock:
+                if (old := self._cache.pop(fname, None)) is not None:
+                    self._used -= old.charged
+            return PublicFile(path, None, stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._cache.get(fname)
+            if (
+                cached is not None
+                and cached.mtime_ns == stat.st_mtime_ns
+                and cached.size == stat.st_size
+            ):
+                self._cache.move_to_end(fname)
+                self._hits += 1
+                return cached
+
+        with open(path, "rb") as rf:
+            data = rf.read()
+        file = PublicFile(
+            path,
+            data,
+            stat.st_mtime_ns,
+            len(data),
+            lambda f, size: self._charge(fname, f, size),
+        )
+
+        with self._lock:
+            self._misses += 1
+            if (old := self._cache.pop(fname, None)) is not None:
+                self._used -= old.charged
+
+            if file.size <= self._max_entry:
+                self._cache[fname] = file
+                file.charged = file.size
+                self._used += file.size
+                self._evict()
+
+        return file
+
+    def _charge(self, fname: str, file: PublicFile, size: int) -> None:
+        """Counts a compressed variant of a file against the budget
+
+        Args:
+            fname (str): The name of the file
+            file (PublicFile): The version of the file the variant belongs to
+            size (int): The size of the variant
+        """
+
+        with self._lock:
+            # Versions no longer cached are freed with their variants
+            if self._cache.get(fname) is not file:
+                return
+
+            file.charged += size
+            self._used += size
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drops the least recently used files until the budget is met, the lock must be held"""
+
+        while self._used > self._budget and self._cache:
+            _, evicted = self._cache.popitem(last=False)
+            self._used -= evicted.charged
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns:
+            dict[str, int]: Cached files, bytes used and hit counters
+        """
+
+        with self._lock:
+            return {
+                "files": len(self._cache),
+                "bytes": self._used,
+                "budget": self._budget,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
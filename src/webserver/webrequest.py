@@ -1,22 +1,77 @@
 from abc import ABC, abstractmethod
 import json
 import os
-import socket
 import logging
 import hashlib
-from typing import Any, Type
+from typing import Any, BinaryIO, Type
 from urllib.parse import unquote
 
+import config
 from locations import PUBLIC
 from utils import CaseInsensitiveDict, dumpb, mime_by_ext
-from webserver.compression_util import ENCODINGS
+from webserver.compression_util import (
+    DYNAMIC_LEVEL,
+    MAX_RATIO,
+    compress,
+    compressible,
+    negotiate,
+)
 from encryption.dh_key_ex import DHServer
 from encryption.enc_socket import EncryptedSocket
-from encryption.encryption import AesEncryption, Encryption
-from webserver.sitescript import load_script_file
+from encryption.encryption import AesEncryption, AesStreamEncryption, Encryption
+from encryption.session import SERVER_SESSIONS, Session
+from webserver.sitescript import SITE_SCRIPTS
+from webserver.static_files import PublicFile, StaticFiles, parse_range
 
 from log import LOG
 
+# Static headers appended to every response, encoded once at import
+DEFAULT_HEADERS = "".join(
+    f"{k}: {v}\n"
+    for k, v in {
+        "Server": "JoaNetAPI",
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Allow-Methods": "POST, GET, OPTIONS",
+        "Access-Control-Allow-Headers": "*",
+    }.items()
+).encode()
+
+
+PUBLIC_FILES = StaticFiles(
+    PUBLIC, int(config.load_var("webserver.static_cache_bytes", 8 * 1024 * 1024))
+)
+
+
+class FileBody:
+    def __init__(
+        self, path: str | BinaryIO, offset: int, length: int, mime: str
+    ) -> None:
+        """A body streamed from a file instead of held in memory
+
+        Args:
+            path (str | BinaryIO): The path of the file or the file opened beforehand, closed once sent
+            offset (int): Position of the first byte to send
+            length (int): Amount of bytes to send
+            mime (str): The `Content-Type` of the body
+        """
+
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.mime = mime
+
+    def send(self, conn: EncryptedSocket, head: list[bytes]) -> None:
+        """Sends the head of the response followed by this body
+
+        Args:
+            conn (EncryptedSocket): The connection to send to
+            head (list[bytes]): The status line and headers
+        """
+
+        # A file opened beforehand is unaffected by its path being replaced meanwhile
+        with open(self.path, "rb") if isinstance(self.path, str) else self.path as rf:
+            conn.sendfile(rf, self.offset, self.length, head)
+
 
 class WebResponse(ABC):
     def __init__(
@@ -26,12 +81,16 @@ class WebResponse(ABC):
         headers: dict[str, str] = {},
         body: tuple[bytes, str] = (b"", "text/plain"),
         keep_alive: bool = False,
+        stream: FileBody | None = None,
+        compress: bool = True,
     ) -> None:
         self._code = status_code
         self._msg = status_msg
         self._headers = headers
         self._body = body
         self._keep_alive = keep_alive
+        self._stream = stream
+        self._compress = compress
 
     @property
     def code(self) -> int:
@@ -53,13 +112,24 @@ class WebResponse(ABC):
     def keep_alive(self) -> bool:
         return self._keep_alive
 
+    @property
+    def stream(self) -> FileBody | None:
+        return self._stream
+
+    @property
+    def compress(self) -> bool:
+        return self._compress
+
     def __str__(self) -> str:
         return f"<WebResponse code={self._code} msg={self._msg}>"
 
 
 class WebRequest:
+    # Largest body accepted, the whole body is held in memory
+    MAX_BODY = 16 * 1024 * 1024
+
     def __init__(
-        self, parent, conn: socket.socket, addr: tuple[str, int], args: dict[str, Any]
+        self, parent, conn: EncryptedSocket, addr: tuple[str, int], args: dict[str, Any]
     ) -> None:
         self._parent = parent
         self.path: str | None = None
@@ -68,22 +138,26 @@ class WebRequest:
         self._recv_headers: CaseInsensitiveDict[str] = CaseInsensitiveDict()
         self._recv_body: bytes | None = None
         self._get_args: dict[str, Any] = {}
-        self._conn = EncryptedSocket(conn)
+        self._conn = conn
         self._addr = addr
         self._args = args
 
-    def _read_line(self) -> str:
-        buff = []
-
-        while (c := self._conn.recv(1)) != b"\n":
-            buff.append(c)
+        # Whether the connection is handed back to the server after the response
+        self.persistent = False
+        self._finished = False
 
-        return (b"".join(buff) + b"\n").decode(errors="ignore")
+    def _read_line(self) -> str:
+        return self._conn.readline().decode(errors="ignore")
 
     def read_headers(self) -> None:
         """Read all headers from the socket"""
 
-        status = self._read_line().split(" ")
+        # Block encrypted connections pad the end of the last request with b"\0"
+        line = self._read_line().lstrip("\0")
+        if len(line) == 0:
+            raise ConnectionAbortedError("Connection closed by peer")
+
+        status = line.split(" ")
         self._parse_status(status)
 
         try:
@@ -97,10 +171,23 @@ class WebRequest:
         except IndexError:
             pass
 
+        self.persistent = self._wants_keep_alive()
+
         METHOD = self.method.lower()  # type: ignore | self.method is never none here, because of the self._parse_status(...) call
         if METHOD == "post" or METHOD == "put":
             self._read_body()
 
+    def _wants_keep_alive(self) -> bool:
+        """
+        Returns:
+            bool: Whether the client wants to send further requests over this connection
+        """
+
+        conn = str(self._recv_headers.get("Connection", "")).lower()
+        if self.version == "HTTP/1.1":
+            return "close" not in conn
+        return "keep-alive" in conn
+
     def _parse_status(self, status: list[str]) -> None:
         LOG.debug("Request for %s", str(status))
         self.method = status.pop(0)
@@ -126,10 +213,37 @@ class WebRequest:
         try:
             if "Content-Length" in self._recv_headers:
                 con_len = int(self._recv_headers["Content-Length"])
+                max_body = int(
+                    config.load_var("webserver.max_body", WebRequest.MAX_BODY)
+                )
+
+                if con_len < 0:
+                    self._reject_body(WebResponse(400, "NEGATIVE_CONTENT_LENGTH"))
+                    return
+                if con_len > max_body:
+                    self._reject_body(WebResponse(413, "PAYLOAD_TOO_LARGE"))
+                    return
+
                 self._recv_body = self._conn.recv(con_len)
-        except TypeError:
-            LOG.warning("Browser sent non-int Content-Length")
-            self._send_response(WebResponse(400, "NON_INT_CONTENT_LENGTH"))
+        except (TypeError, ValueError):
+            self._reject_body(WebResponse(400, "NON_INT_CONTENT_LENGTH"))
+
+    def _reject_body(self, response: WebResponse) -> None:
+        """Answers a request whose body is not read
+
+        Args:
+            response (WebResponse): The error response
+        """
+
+        LOG.warning(
+            "Rejecting body of %s with Content-Length %s",
+            self.path,
+            self._recv_headers.get("Content-Length"),
+        )
+
+        # The unread body would be parsed as the next request on this connection
+        self.persistent = False
+        self._send_response(response)
 
     def _send_response(self, response: WebResponse) -> None:
         """Send a response based on a code and message
@@ -139,86 +253,93 @@ class WebRequest:
             message (str): The status message of the response
         """
 
+        if self._finished:
+            LOG.debug("Response already sent, dropping %s", str(response))
+            return
+
         LOG.info(
             f"{response.code} [{response.msg}] for {self.path} from {self._conn.sock().getpeername()[0]} [{self.version}]"
         )
-        self._conn.send(f"{self.version} {response.code} {response.msg}\n".encode())
-        self._default_headers()
-
-        for k, v in response.headers.items():
-            self._send_header(k, v)
-
-        self._send_body(*response.body, response.keep_alive)
-
-    def _send_header(self, key: str, value: str) -> None:
-        """Send one header
-
-        Args:
-            key (str): The key of the header
-            value (str): The value of the header
-        """
+        # Requests rejected before they were read have no version yet
+        status = f"{self.version or 'HTTP/1.1'} {response.code} {response.msg}\n"
+        headers = [f"{k}: {v}\n" for k, v in response.headers.items()]
+
+        # Responses kept alive are protocol changes, the handler continues on this connection
+        if not response.keep_alive:
+            headers.append(
+                f"Connection: {'keep-alive' if self.persistent else 'close'}\n"
+            )
 
-        self._conn.send(f"{key}: {value}\n".encode())
+        body, c_type = response.body
+        if response.stream is not None:
+            headers.append(f"Content-Type: {response.stream.mime}\n")
+            headers.append(f"Content-Length: {response.stream.length}\n")
+        elif len(body) > 0:
+            headers.append(f"Content-Type: {c_type}\n")
+
+            if response.compress and compressible(c_type, len(body)):
+                headers.append("Vary: Accept-Encoding\n")
+                body, encoding = self._compress_body(body)
+                if encoding is not None:
+                    headers.append(f"Content-Encoding: {encoding}\n")
+
+            headers.append(f"Content-Length: {len(body)}\n")
+        elif not response.keep_alive and response.code not in (204, 304):
+            # Lets the client know where this response ends without a closed connection
+            headers.append("Content-Length: 0\n")
+        headers.append("\n")
+
+        head = [status.encode(), self._default_headers(), "".join(headers).encode()]
+        if response.stream is not None:
+            response.stream.send(self._conn, head)
+        else:
+            # The whole response leaves in one write and one encryption pass
+            self._conn.sendmsg([*head, body])
 
-    def _end_headers(self) -> None:
-        """End the headers for this response"""
+        if not response.keep_alive:
+            self._finish()
 
-        self._conn.send(b"\n")
+    def _finish(self) -> None:
+        """Hands the connection back to the server to wait for the next request or closes it"""
 
-    def _send_body(
-        self, body: bytes, c_type: str = "plain/text", keep_alive: bool = False
-    ) -> None:
-        """Send the body of the request
+        self._finished = True
+        if self.persistent:
+            self._parent.reuse(self._conn, self._addr)
+        else:
+            self._conn.close()
 
-        Args:
-            body (bytes): The body object in bytes or b"" for no body
-            c_type (str, optional): The `Content-Type` of the body. Defaults to "plain/text".
+    def finished(self) -> bool:
+        """
+        Returns:
+            bool: Whether the final response of this request was sent
         """
 
-        if len(body) == 0:
-            self._end_headers()
-            self._conn.flush()
-            if not keep_alive:
-                self._conn.close()
-            return
-
-        self._send_header("Content-Type", c_type)
-        compressed = self._compress_body(body)
+        return self._finished
 
-        self._send_header("Content-Length", f"{len(compressed)}")
-        self._end_headers()
+    def close(self) -> None:
+        """Closes the connection without a response, e.g. after the handler failed"""
 
-        self._conn.send(compressed)
-        self._conn.flush()
-        if not keep_alive:
-            self._conn.close()
+        self._finished = True
+        self._conn.close()
 
-    def _compress_body(self, orig: bytes) -> bytes:
-        """Tries to compress the body using the encodings provided in the request
+    def _compress_body(self, orig: bytes) -> tuple[bytes, str | None]:
+        """Tries to compress the body using the encoding the client prefers
 
         Args:
             orig (bytes): The body object as bytes
 
         Returns:
-            bytes: The encoded body or the original body depending on the `Accept-Encoding` and length
+            tuple[bytes, str | None]: The encoded body or the original body depending on the `Accept-Encoding` and length, and the `Content-Encoding` used
         """
 
-        if "accept-encoding" not in self._recv_headers:
-            return orig
-        body = orig
-        accepts = str(self._recv_headers.get("Accept-Encoding", "")).split(", ")
-        used = []
-        for name, func in ENCODINGS:
-            if name in accepts:
-                body = func(body)
-                used.append(name)
-
-        if len(orig) <= len(body):
-            return orig
-        else:
-            if len(used) > 0:
-                self._send_header("Content-Encoding", ", ".join(used))
-            return body
+        encoding = negotiate(self._recv_headers.get("Accept-Encoding"))
+        if encoding is None:
+            return orig, None
+
+        body = compress(encoding, orig, DYNAMIC_LEVEL)
+        if len(body) >= len(orig) * MAX_RATIO:
+            return orig, None
+        return body, encoding
 
     def has_public(self) -> str | None:
         """Checks if there is a public file for the requested path
@@ -229,15 +350,7 @@ class WebRequest:
 
         if self.path == None:
             return None
-        for f in os.listdir(PUBLIC):
-            name, ext = os.path.splitext(f)
-            if (
-                self.path.strip("/").lower() in [name.lower(), f.lower()]
-                and ext.lower() != "py"
-            ):
-                return f
-
-        return None
+        return PUBLIC_FILES.find(self.path)
 
     def send_page(self, fname: str) -> None:
         """Sends the contents in the provided file and searches for SiteScripts of this file
@@ -266,21 +379,133 @@ class WebRequest:
             if self._load_sitescript(name, mime, path):
                 return
 
-            with open(path, "rb") as rf:
-                self._send_response(WebResponse(200, "OK", body=(rf.read(), mime)))
+            file = PUBLIC_FILES.load(fname)
+            if file is None:
+                self._send_response(WebResponse(404, "NOT_FOUND"))
+                return
+
+            encoding = self._static_encoding(file)
+            headers = file.headers(encoding)
+
+            # Clients revalidating their copy get a 304 without the contents
+            if file.not_modified(
+                self._recv_headers.get("If-None-Match"),
+                self._recv_headers.get("If-Modified-Since"),
+            ):
+                self._send_response(WebResponse(304, "NOT_MODIFIED", headers=headers))
+                return
+
+            self._send_response(self._file_response(file, mime, encoding, headers))
         except Exception:
             LOG.exception("Exception while sending")
 
+    def _static_encoding(self, file: PublicFile) -> str | None:
+        """Picks the precompressed variant of a static file to send
+
+        Args:
+            file (PublicFile): The requested file
+
+        Returns:
+            str | None: The encoding of the variant or `None` to send the file as it is
+        """
+
+        # Ranges address the bytes of the file itself
+        if "Range" in self._recv_headers or not compressible(file.mime, file.size):
+            return None
+
+        encoding = negotiate(self._recv_headers.get("Accept-Encoding"))
+        if encoding is None or file.encoded(encoding) is None:
+            return None
+        return encoding
+
+    def _file_response(
+        self,
+        file: PublicFile,
+        mime: str,
+        encoding: str | None,
+        headers: dict[str, str],
+    ) -> WebResponse:
+        """Makes the response for a static file, honoring a requested byte range
+
+        Args:
+            file (PublicFile): The file to send
+            mime (str): The `Content-Type` of the file
+            encoding (str | None): The encoding of the precompressed variant to send
+            headers (dict[str, str]): The headers of the file
+
+        Returns:
+            WebResponse: The `200`, `206` or `416` response
+        """
+
+        # Static files were negotiated already and ranges address
+        # the bytes of the file, so neither is compressed on the fly
+        if encoding is not None:
+            return WebResponse(
+                200,
+                "OK",
+                headers=headers,
+                body=(file.encoded(encoding) or b"", mime),
+                compress=False,
+            )
+
+        offset, length = 0, file.size
+        code, msg = 200, "OK"
+
+        range_hdr = self._recv_headers.get("Range")
+        if range_hdr is not None and file.matches(self._recv_headers.get("If-Range")):
+            try:
+                span = parse_range(range_hdr, file.size)
+            except ValueError:
+                headers["Content-Range"] = f"bytes */{file.size}"
+                return WebResponse(416, "RANGE_NOT_SATISFIABLE", headers=headers)
+
+            if span is not None:
+                offset, length = span
+                code, msg = 206, "PARTIAL_CONTENT"
+                headers["Content-Range"] = (
+                    f"bytes {offset}-{offset + length - 1}/{file.size}"
+                )
+
+        if file.data is None:
+            return WebResponse(
+                code,
+                msg,
+                headers=headers,
+                stream=FileBody(file.path, offset, length, mime),
+            )
+
+        if code == 206:
+            body = file.data[offset : offset + length]
+        else:
+            body = file.data
+        return WebResponse(
+            code, msg, headers=headers, body=(body, mime), compress=False
+        )
+
     def _load_sitescript(self, name: str, mime: str, path: str) -> bool:
         if os.path.isfile(os.path.join(PUBLIC, f"{name}.py")):
             LOG.debug("SiteScript file found")
             # SiteScript file exists and we can check format
-            script = load_script_file(PUBLIC, f"{name}.py")
+            script = SITE_SCRIPTS.get(os.path.join(PUBLIC, f"{name}.py"))
             if script != None:
                 s = script(self._get_args)
                 site_bin = s.site_read(path)
+
+                if s.stream is not None:
+                    source, offset, length = s.stream
+                    spath = source if isinstance(source, str) else source.name
+                    smime = mime_by_ext(spath)
+                    self._send_response(
+                        WebResponse(
+                            *s.status,
+                            headers=s.headers,
+                            stream=FileBody(source, offset, length, smime),
+                        )
+                    )
+                    return True
+
                 self._send_response(
-                    WebResponse(200, "OK", body=(site_bin, mime), headers=s.headers)
+                    WebResponse(*s.status, body=(site_bin, mime), headers=s.headers)
                 )
                 return True
             LOG.debug("Not a SiteScript python file")
@@ -385,29 +610,98 @@ class WebRequest:
         )
 
     def do_SECURE(self) -> None:
-        # Perform the DH Key Exchange
+        if "DH-E" not in self._recv_headers and "Session-Id" in self._recv_headers:
+            if not self._resume_session():
+                return
+        else:
+            self._exchange_keys()
+
+        # Read the actual encrypted HTTP request, routed like the ones
+        # following it on this connection
+        self.read_headers()
+        if file := self.has_public():
+            self.send_page(file)
+        else:
+            self.evaluate()
+
+    def _exchange_keys(self) -> None:
+        """Performs the DH key exchange and issues a session for stream capable clients"""
 
         dh = DHServer()
         dh.read_e(int(self._recv_headers["DH-E"]))
+
+        # Use the stream encryption if the client offers it, old clients only know the block mode
+        modes = str(self._recv_headers.get("Enc-Mode", "")).split(",")
+        stream = AesStreamEncryption.MODE in [m.strip() for m in modes]
+
+        headers = {"DH-F": str(dh.get_f())}
+        if stream:
+            headers["Enc-Mode"] = AesStreamEncryption.MODE
+
+            ttl = float(config.load_var("secure.session_ttl", Session.TTL))
+            if ttl > 0:
+                session = Session(
+                    Session.make_id(), dh.make_session_secret(), ttl, self._addr[0]
+                )
+                SERVER_SESSIONS.add(session.session_id, session)
+                headers["Session-Id"] = session.session_id
+                headers["Session-TTL"] = str(int(ttl))
+
         self._send_response(
-            WebResponse(
-                101, "SECURE", headers={"DH-F": str(dh.get_f())}, keep_alive=True
-            )
+            WebResponse(101, "SECURE", headers=headers, keep_alive=True)
         )
 
         # Create the encryption
         key = dh.make_enc_key(AesEncryption.key_len())
-        iv = dh.make_iv_str(AesEncryption.iv_len())
-        self._conn.update_encryption(AesEncryption(key, iv))
+        if stream:
+            c2s, s2c = dh.make_stream_ivs(AesStreamEncryption.iv_len())
+            self._conn.update_encryption(AesStreamEncryption(key, s2c, c2s))
+        else:
+            iv = dh.make_iv_str(AesEncryption.iv_len())
+            self._conn.update_encryption(AesEncryption(key, iv))
 
-        # Read the actual encrypted HTTP request
-        self.read_headers()
-        self.evaluate()
+    def _resume_session(self) -> bool:
+        """Resumes a session issued by an earlier key exchange
 
-    def _default_headers(self) -> None:
-        """Default headers appended to every response"""
+        Returns:
+            bool: Whether the session was resumed, a response was sent otherwise
+        """
+
+        session = SERVER_SESSIONS.get(str(self._recv_headers["Session-Id"]))
+        if session is None or session.peer != self._addr[0]:
+            self._send_response(WebResponse(401, "SESSION_EXPIRED"))
+            return False
+
+        try:
+            client_nonce = bytes.fromhex(str(self._recv_headers["Session-Nonce"]))
+        except (KeyError, ValueError):
+            client_nonce = b""
+
+        if len(client_nonce) != Session.NONCE_LEN:
+            self._send_response(WebResponse(400, "INVALID_NONCE"))
+            return False
+
+        server_nonce = Session.make_nonce()
+        self._send_response(
+            WebResponse(
+                101,
+                "SECURE",
+                headers={
+                    "Enc-Mode": AesStreamEncryption.MODE,
+                    "Session-Nonce": server_nonce.hex(),
+                },
+                keep_alive=True,
+            )
+        )
+        self._conn.update_encryption(
+            session.make_encryption(client_nonce, server_nonce, True)
+        )
+        return True
+
+    def _default_headers(self) -> bytes:
+        """
+        Returns:
+            bytes: The encoded default headers appended to every response
+        """
 
-        self._send_header("Server", "JoaNetAPI")
-        self._send_header("Access-Control-Allow-Origin", "*")
-        self._send_header("Access-Control-Allow-Methods", "POST, GET, OPTIONS")
-        self._send_header("Access-Control-Allow-Headers", "*")
+        return DEFAULT_HEADERS
@@ -1,17 +1,25 @@
-import select
+from collections import deque
+import selectors
 import socket
 import logging
+import time
 from threading import Thread
-from time import sleep
-from typing import Any, Type
+from typing import Any, Callable, Type
 
+import config
+from encryption.enc_socket import EncryptedSocket
+from proj_types.worker_pool import WorkerPool
 from utils import CleanUp
-from webserver.webrequest import WebRequest
+from webserver.webrequest import WebRequest, WebResponse
 
 from log import LOG, logged_thread
 
 
 class WebServer(CleanUp):
+    WORKERS = 8
+    QUEUE_SIZE = 32
+    KEEP_ALIVE_TIMEOUT = 15
+
     def __init__(
         self, port, handler: Type[WebRequest] = WebRequest, args: dict[str, Any] = {}
     ) -> None:
@@ -24,10 +32,30 @@ class WebServer(CleanUp):
         self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self._socket.bind((self._hostname, self._port))
 
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+
+        # Connections waiting for their next request and when they are closed if none arrives
+        self._idle: dict[EncryptedSocket, float] = {}
+        self._reused: deque[tuple[EncryptedSocket, tuple[str, int]]] = deque()
+        self._keep_alive_timeout = float(
+            config.load_var(
+                "webserver.keep_alive_timeout", WebServer.KEEP_ALIVE_TIMEOUT
+            )
+        )
+
+        self._pool = WorkerPool(
+            "RequestHTTP",
+            int(config.load_var("webserver.workers", WebServer.WORKERS)),
+            int(config.load_var("webserver.queue_size", WebServer.QUEUE_SIZE)),
+        )
+
     def start_blocking(self) -> None:
         """Starts the server in the current thread"""
 
         self._socket.listen()
+        self._socket.setblocking(False)
+        self._wake_r.setblocking(False)
         self._started = True
         self._listen()
 
@@ -41,49 +69,238 @@ class WebServer(CleanUp):
         ).start()
 
     def _listen(self) -> None:
-        """Main method for the listening thread"""
+        """Main method for the listening thread, blocks until any socket is ready"""
+
+        self._selector.register(self._socket, selectors.EVENT_READ, self._accept)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, self._drain_wakeup)
 
         try:
             while self._started:
-                try:
-                    readable, _, _ = select.select([self._socket], [], [], 0)
-                    if self._socket not in readable:
-                        sleep(0.1)
-                        continue
-
-                    conn, addr = self._socket.accept()
-                    self._handle(conn, addr)
-                except Exception:
-                    LOG.debug("Exception while recieving", exc_info=True)
+                for key, _ in self._selector.select(self._idle_timeout()):
+                    callback: Callable[[Any], None] = key.data
+                    try:
+                        callback(key.fileobj)
+                    except Exception:
+                        LOG.debug("Exception while recieving", exc_info=True)
+                self._close_idle()
         except KeyboardInterrupt:
             pass
-        self._socket.close()
+
+        self._close_all()
         LOG.info("Closed socket")
 
-    def _handle(self, conn: socket.socket, addr: tuple[str, int]) -> None:
-        try:
-            LOG.debug("Got request by %s", str(addr[0]))
-            request: WebRequest = self._handler(self, conn, addr, self._handler_args)
-            request.read_headers()
+    def _accept(self, sock: socket.socket) -> None:
+        """Accepts every pending connection and waits for their request to arrive
 
-            if file := request.has_public():
-                logged_thread(
-                    target=request.send_page,
-                    args=(file,),
-                    daemon=True,
-                    name="StaticHTTP",
-                ).start()
+        Args:
+            sock (socket.socket): The listening socket
+        """
+
+        while True:
+            try:
+                conn, addr = sock.accept()
+            except (BlockingIOError, InterruptedError):
                 return
 
-            logged_thread(
-                target=request.evaluate, daemon=True, name="RequestHTTP"
-            ).start()
+            # Accepted sockets should behave like the ones of a blocking listener
+            conn.settimeout(socket.getdefaulttimeout())
+            # Responses on kept alive connections must not wait for the ACK of the last one
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._wait_request(EncryptedSocket(conn), addr)
+
+    def _wait_request(self, conn: EncryptedSocket, addr: tuple[str, int]) -> None:
+        """Waits for the next request on a connection without blocking the listener
+
+        Args:
+            conn (EncryptedSocket): The client connection
+            addr (tuple[str, int]): The address of the client
+        """
+
+        # Pipelined requests are already buffered and would never wake the selector
+        if conn.buffered():
+            self._handle(conn, addr)
+            return
+
+        self._idle[conn] = time.monotonic() + self._keep_alive_timeout
+        self._selector.register(
+            conn.sock(),
+            selectors.EVENT_READ,
+            lambda _, conn=conn, addr=addr: self._readable(conn, addr),
+        )
+
+    def _readable(self, conn: EncryptedSocket, addr: tuple[str, int]) -> None:
+        """Called once the client sent data on a waiting connection
+
+        Args:
+            conn (EncryptedSocket): The client connection
+            addr (tuple[str, int]): The address of the client
+        """
+
+        self._selector.unregister(conn.sock())
+        del self._idle[conn]
+        self._handle(conn, addr)
+
+    def reuse(self, conn: EncryptedSocket, addr: tuple[str, int]) -> None:
+        """Hands a connection back after its response was sent, to wait for the next request on it
+
+        Args:
+            conn (EncryptedSocket): The client connection
+            addr (tuple[str, int]): The address of the client
+
+        Notes:
+            Called from the worker threads, the listening thread picks the connection up after its wakeup
+        """
+
+        self._reused.append((conn, addr))
+        self._wakeup()
+
+    def _idle_timeout(self) -> float | None:
+        """
+        Returns:
+            float | None: Seconds until the next idle connection times out or `None` if none is waiting
+        """
+
+        if len(self._idle) == 0:
+            return None
+        return max(0.0, min(self._idle.values()) - time.monotonic())
+
+    def _close_idle(self) -> None:
+        """Closes every connection which did not send its next request in time"""
+
+        now = time.monotonic()
+        for conn, deadline in list(self._idle.items()):
+            if deadline <= now:
+                self._selector.unregister(conn.sock())
+                del self._idle[conn]
+                conn.close()
+
+    def _drain_wakeup(self, sock: socket.socket) -> None:
+        """Empties the wakeup socket so the selector can block again
+
+        Args:
+            sock (socket.socket): The reading end of the wakeup pair
+        """
+
+        try:
+            while sock.recv(1024):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+        while self._reused:
+            self._wait_request(*self._reused.popleft())
+
+    def _wakeup(self) -> None:
+        """Interrupts a blocking `select` call of the listening thread"""
+
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            pass
+
+    def _close_all(self) -> None:
+        """Closes the listener and all connections still waiting for a request"""
+
+        for key in list(self._selector.get_map().values()):
+            sock: socket.socket = key.fileobj  # type: ignore
+            self._selector.unregister(sock)
+            if sock is not self._wake_r:
+                sock.close()
+
+        while self._reused:
+            self._reused.popleft()[0].close()
+        self._idle.clear()
+
+        self._selector.close()
+        self._wake_r.close()
+        self._wake_w.close()
+
+    def _handle(self, conn: EncryptedSocket, addr: tuple[str, int]) -> None:
+        """Hands a connection with a request arriving to a worker, the listener never reads from it
+
+        Args:
+            conn (EncryptedSocket): The client connection
+            addr (tuple[str, int]): The address of the client
+        """
+
+        LOG.debug("Got request by %s", str(addr[0]))
+        request: WebRequest = self._handler(self, conn, addr, self._handler_args)
+        if not self._pool.submit(self._process, (request,)):
+            self._reject(request)
+
+    def _reject(self, request: WebRequest) -> None:
+        """Answers `503` to a request the workers have no room for, without waiting for the client
+
+        Args:
+            request (WebRequest): The request to reject
+        """
+
+        sock = request._conn.sock()
+        try:
+            # Closing with unread data resets the connection before the client reads the response
+            sock.setblocking(False)
+            try:
+                while sock.recv(65536):
+                    pass
+            except (BlockingIOError, InterruptedError):
+                pass
+            sock.settimeout(socket.getdefaulttimeout())
+
+            request.persistent = False
+            request._send_response(
+                WebResponse(503, "SERVICE_UNAVAILABLE", headers={"Retry-After": "1"})
+            )
+        except Exception:
+            LOG.debug("Connection closed unexpectedly:", exc_info=True)
+            request.close()
+
+    def _process(self, request: WebRequest) -> None:
+        """Reads and handles a request on a worker, closing the connection if it did not respond
+
+        Args:
+            request (WebRequest): The request to handle
+        """
+
+        try:
+            if self._read_request(request):
+                if file := request.has_public():
+                    request.send_page(file)
+                else:
+                    request.evaluate()
+        finally:
+            if not request.finished():
+                request.close()
+
+    def _read_request(self, request: WebRequest) -> bool:
+        """Reads the headers and body of a request, slow clients only hold up their worker
+
+        Args:
+            request (WebRequest): The request to read
+
+        Returns:
+            bool: Whether the request was read and is to be handled, `False` if it was answered while reading
+        """
+
+        try:
+            request.read_headers()
+            return not request.finished()
         except ConnectionAbortedError:
+            addr = request._addr
             LOG.debug("Connection Aborted by %s:%s", str(addr[0]), str(addr[1]))
         except Exception:
             LOG.debug("Connection closed unexpectedly:", exc_info=True)
-            if conn != None:
-                conn.close()
+
+        return False
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Returns:
+            dict[str, int | float]: Queue depth, job counters and wait times of the request workers
+        """
+
+        return self._pool.stats()
 
     def cleanup(self) -> None:
         self._started = False
+        self._wakeup()
+        self._pool.shutdown()